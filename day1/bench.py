@@ -0,0 +1,75 @@
+"""Benchmark of the day1 top K engines on generated elf files
+
+Times `top_k_heap` and `top_k_numpy` on files with more and more elves and
+reports the smallest file on which numpy is the faster one.
+
+Usage::
+
+    python -m day1.bench --top 3 --max-elves 1000000
+"""
+import os
+import random
+import tempfile
+import time
+import util
+
+from day1 import day1
+
+
+def main():
+    opts = util.parse_args(
+        args={
+            "--top": dict(help="Number of top elves.", type=int, default=3),
+            "--max-elves": dict(type=int, default=1_000_000),
+            "--repeat": dict(help="Best time of these many runs.", type=int, default=3),
+            "--seed": dict(type=int, default=1),
+        }
+    )
+    crossover = None
+    num_elves = 1
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        fl = os.path.join(tmp_dir, "elf-calories.txt")
+        while num_elves <= opts.max_elves:
+            generate(fl=fl, num_elves=num_elves, seed=opts.seed)
+            times, tops = {}, {}
+            for name, engine in [
+                ("heap", lambda: day1.top_k_heap(util.iter_fl_lines(fl=fl), opts.top)),
+                ("numpy", lambda: day1.top_k_numpy(fl=fl, k=opts.top)),
+            ]:
+                times[name] = []
+                for _ in range(opts.repeat):
+                    st = time.perf_counter()
+                    tops[name] = engine()
+                    times[name].append(time.perf_counter() - st)
+            if tops["heap"] != tops["numpy"]:
+                raise RuntimeError(f"The engines disagree on the top elves {tops}")
+            heap_tm, numpy_tm = min(times["heap"]), min(times["numpy"])
+            util.log.info(
+                f"{num_elves:>10,} elves {os.path.getsize(fl) / 1e6:>8.2f}MB | "
+                f"heap: {heap_tm * 1000:>9.2f}ms | numpy: {numpy_tm * 1000:>9.2f}ms"
+            )
+            if crossover is None and numpy_tm < heap_tm:
+                crossover = num_elves
+            num_elves *= 10
+    if crossover is None:
+        util.log.info("heap is faster on every file")
+    else:
+        util.log.info(f"numpy is faster from {crossover:,} elves")
+
+
+def generate(fl: str, num_elves: int, seed: int) -> None:
+    """An elf file with 1 to 15 snacks of up to 10k calories per elf."""
+    rng = random.Random(seed)
+    with open(fl, "w") as outfile:
+        outfile.write(
+            "\n\n".join(
+                "\n".join(
+                    str(rng.randint(1, 10_000)) for _ in range(rng.randint(1, 15))
+                )
+                for _ in range(num_elves)
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Advent of code 2022 day 1 solution
+
+https://adventofcode.com/2022/day/1
+
+Sum of the calories carried by the top K elves, part 1 of `prob1.py` is
+K=1 and part 2 of `prob2.py` is K=3. The heap engine streams the elves and
+keeps only the best K totals, the numpy engine totals every elf at once.
+
+Usage::
+
+    # Top elf
+    python -m day1.day1 --file day1/elf-calories.txt
+
+    # Top 3 elves with numpy
+    python -m day1.day1 --file day1/elf-calories.txt --top 3 --engine numpy
+
+    # Top 3 elves of a large file, sharded over 8 processes
+    python -m day1.day1 --file day1/elf-calories.txt --top 3 --engine sharded \\
+        --workers 8
+"""
+import functools
+import heapq
+import time
+import util
+
+from typing import Iterable
+
+import numpy as np
+
+
+def main() -> None:
+    opts = util.parse_args(
+        args={
+            "--top": dict(help="Number of top elves.", type=int, default=1),
+            "--engine": dict(choices=["heap", "numpy", "sharded"], default="heap"),
+            "--workers": dict(
+                help="Processes for the sharded engine, all cores by default.",
+                type=int,
+            ),
+        }
+    )
+    st = time.time()
+    if opts.engine == "heap":
+        top_cals = top_k_heap(lns=util.iter_fl_lines(fl=opts.file), k=opts.top)
+    elif opts.engine == "numpy":
+        top_cals = top_k_numpy(fl=opts.file, k=opts.top)
+    else:
+        top_cals = top_k_sharded(fl=opts.file, k=opts.top, workers=opts.workers)
+    util.log.info(f"Top {opts.top} elves: {top_cals}")
+    util.log.info(f"Calories of top {opts.top} elves: {sum(top_cals):,}")
+    util.log.info(f"Elapsed: {time.time() - st:.3f}s")
+
+
+def top_k_heap(lns: Iterable[str], k: int) -> list[int]:
+    """Calories of the top `k` elves in descending order. Streams the lines
+    and keeps a min-heap of the best `k` totals, so memory is O(k).
+    """
+    heap: list[int] = []
+    elf_cals, has_items = 0, False
+    # the sentinel blank line ends the last elf
+    for ln in _chain_blank(lns):
+        if ln:
+            elf_cals += int(ln)
+            has_items = True
+            continue
+        if not has_items:
+            continue
+        if len(heap) < k:
+            heapq.heappush(heap, elf_cals)
+        else:
+            heapq.heappushpop(heap, elf_cals)
+        elf_cals, has_items = 0, False
+    return sorted(heap, reverse=True)
+
+
+def _chain_blank(lns: Iterable[str]) -> Iterable[str]:
+    yield from lns
+    yield ""
+
+
+def top_k_numpy(fl: str, k: int) -> list[int]:
+    """Same as `top_k_heap` with every line of the file loaded at once. The
+    elves are totalled with `np.add.reduceat` from their blank lines and the
+    top `k` picked with `np.partition`.
+    """
+    with open(fl, "rb") as infile:
+        lns = np.array(infile.read().split(b"\n"))
+    blank = lns == b""
+    cals = np.where(blank, b"0", lns).astype(np.int64)
+    # every elf starts at its blank line, so no group is ever empty
+    starts = np.concatenate([[0], np.flatnonzero(blank)])
+    totals = np.add.reduceat(cals, starts)
+    # consecutive or trailing blank lines make groups without items
+    totals = totals[np.add.reduceat(~blank, starts) > 0]
+    if len(totals) > k:
+        totals = np.partition(totals, len(totals) - k)[-k:]
+    return sorted(totals.tolist(), reverse=True)
+
+
+def top_k_sharded(fl: str, k: int, workers=None) -> list[int]:
+    """`top_k_heap` of every shard of the file in a process pool, the top
+    `k` of each shard are then merged.
+    """
+    return util.map_reduce_fl(
+        fl=fl,
+        map_fn=functools.partial(_top_k_elves, k=k),
+        reduce_fn=functools.partial(_merge_top_k, k=k),
+        sep=b"\n\n",
+        workers=workers,
+    )
+
+
+def _top_k_elves(elves: list[str], k: int) -> list[int]:
+    return heapq.nlargest(k, (sum(map(int, elf.split())) for elf in elves))
+
+
+def _merge_top_k(top1: list[int], top2: list[int], k: int) -> list[int]:
+    return heapq.nlargest(k, top1 + top2)
+
+
+if __name__ == "__main__":
+    main()
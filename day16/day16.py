@@ -0,0 +1,377 @@
+"""Advent of code 2022 day 16 solution
+
+https://adventofcode.com/2022/day/16
+
+Promoted from `day16-solution.ipynb` so that the solvers can run headless.
+
+Usage::
+
+    # Part 1 with the bitmask DP solver
+    python -m day16.day16 --file day16/input.txt
+
+    # Part 2, two players with 26 minutes
+    python -m day16.day16 --file day16/input.txt --players 2 --max-time 26
+
+    # The notebook's backtracking solver
+    python -m day16.day16 --file day16/input.txt --solver backtrack
+"""
+import collections
+import copy
+import itertools
+import re
+import time
+import util
+
+from dataclasses import dataclass
+from typing import Generator
+from typing import NewType
+from typing import Optional
+from typing import Union
+
+from day16 import valve_dp
+from day16.valve_dp import PathPressure
+
+
+MAX_TIME = 30
+START_NODE = "AA"
+LINE_RE = re.compile(
+    r"Valve ([A-Z]{2}) has flow rate=(\d+); tunnels{0,1} leads{0,1} to valves{0,1} (.*)"
+)
+
+
+@dataclass
+class GraphNode:
+    name: str
+    flow_rate: int
+    adjs: set[str]
+
+
+Graph = NewType("Graph", dict[str, GraphNode])
+
+
+@dataclass
+class MaxPressure:
+    pressure: int = 0
+
+
+@dataclass(frozen=True, order=True)
+class Player:
+    num: int
+    next_node: Optional[str]
+    next_time: Union[int, float]
+
+    def __deepcopy__(self, memo):
+        return Player(
+            num=self.num,
+            next_node=self.next_node,
+            next_time=self.next_time,
+        )
+
+
+def main() -> None:
+    opts = util.parse_args(
+        args={
+            "--players": dict(help="Number of players.", type=int, default=1),
+            "--max-time": dict(help="Time budget in mins.", type=int, default=MAX_TIME),
+            "--start-node": dict(
+                help="Valve to start from, never opened even if it has a flow rate.",
+                default=START_NODE,
+            ),
+            "--solver": dict(
+                help="Solver to use.", choices=["dp", "backtrack"], default="dp"
+            ),
+        }
+    )
+    st = time.time()
+    graph = parse_input_fl(fl=opts.file)
+    parse_tm = time.time() - st
+    util.log.info(f"Parsed {len(graph):,} valves in {parse_tm:.3f}s")
+    solver = {
+        "dp": valve_dp.max_pressure_dp,
+        "backtrack": max_pressure_backtrack,
+    }[opts.solver]
+    st = time.time()
+    best_press = solver(
+        graph=graph,
+        max_time=opts.max_time,
+        start_node=opts.start_node,
+        num_players=opts.players,
+    )
+    solve_tm = time.time() - st
+    util.log.info(f"Solved with {opts.solver} in {solve_tm:.3f}s")
+    util.log.debug(best_press)
+    util.log.info(f"Maximum pressure: {best_press.pressure}")
+
+
+def parse_input_fl(fl: str) -> Graph:
+    """Parses the valves one line at a time, so large generated graphs are
+    never read into memory as a whole.
+    """
+    graph = Graph({})
+    for node in iter_nodes(fl=fl):
+        graph[node.name] = node
+    return graph
+
+
+def iter_nodes(fl: str) -> Generator[GraphNode, None, None]:
+    for ln in util.iter_fl(fl=fl):
+        if ln:
+            yield _parse_line(ln=ln)
+
+
+def _parse_line(ln: str) -> GraphNode:
+    """
+    Sample input: "Valve BB has flow rate=13; tunnels lead to valves CC, AA"
+    Sample output: GraphNode(name="BB", flow_rate=13, adjs={"CC", "AA"})
+    """
+    valve, flow_rate, neighbours = LINE_RE.match(ln).groups()
+    return GraphNode(
+        name=valve,
+        flow_rate=int(flow_rate),
+        adjs=set(neighbours.split(", ")),
+    )
+
+
+def _compute_dists(graph: Graph, nodes: set[str]) -> dict[tuple[str, str], int]:
+    dist_map = {}
+    for src, end in itertools.combinations(nodes, 2):
+        dist = _min_dist_bfs(graph=graph, src=src, end=end)
+        dist_map[(src, end)] = dist_map[(end, src)] = dist
+    return dist_map
+
+
+def _min_dist_bfs(graph: Graph, src: str, end: str) -> int:
+    """Finds the shortest distance between src and end."""
+    q = collections.deque([src])
+    seen = {src}
+    dist = 0
+    while q:
+        dist += 1
+        for _ in range(len(q)):
+            node = q.popleft()
+            for adj in graph[node].adjs:
+                if adj == end:
+                    return dist
+                if adj not in seen:
+                    seen.add(adj)
+                    q.append(adj)
+    else:
+        raise ValueError("No path found.")
+
+
+def max_pressure_backtrack(
+    graph: Graph,
+    max_time: int = MAX_TIME,
+    start_node: str = START_NODE,
+    num_players: int = 1,
+) -> PathPressure:
+    # the start node is never opened, so it is not a valve to visit
+    flow_nodes = _fetch_nz_fr(graph=graph) - {start_node}
+    # Use bfs to find distance between any two non zero flow nodes (+ start_node).
+    flow_dists = _compute_dists(graph=graph, nodes=flow_nodes | {start_node})
+    players = {
+        i: Player(num=i, next_node=start_node, next_time=0) for i in range(num_players)
+    }
+    best_press = max_pressure_rec(
+        players=players,
+        cur_time=0,
+        turned_on=set(),
+        start_node=start_node,
+        flow_nodes=flow_nodes,
+        flow_dists=flow_dists,
+        graph=graph,
+        max_time=max_time,
+        cache={},
+        max_press=MaxPressure(),
+    )
+    return PathPressure(
+        pressure=best_press.pressure,
+        actions=list(reversed(best_press.actions)),
+    )
+
+
+def _fetch_nz_fr(graph: Graph, verbose=True) -> set[str]:
+    """Returns the nodes with non zero flow rate."""
+    nz_fr = {n.name for n in graph.values() if n.flow_rate > 0}
+    num_nz_fr, num_graph = len(nz_fr), len(graph)
+    ratio = num_nz_fr / num_graph
+    if verbose:
+        util.log.info(
+            f"Num nodes with non-zero flowrate: {num_nz_fr}/{num_graph}, {ratio:.0%}"
+        )
+    return nz_fr
+
+
+def max_pressure_rec(
+    players: dict[int, Player],
+    cur_time: int,
+    turned_on: set[str],
+    start_node: str,
+    flow_nodes: set[str],
+    flow_dists: dict[tuple[str, str], int],
+    graph: Graph,
+    max_time: int,
+    cache: dict[tuple[int, str, str], PathPressure],
+    max_press: MaxPressure,
+) -> PathPressure:
+    player = _available_player(players=players, cur_time=cur_time)
+    cur = player.next_node
+    if (cur_time >= (max_time - 1)) or len(turned_on) == len(flow_nodes):
+        # Timeout: max_time-1 because at time 29, any action we take will
+        #   take a minute and will not release any extra pressure.
+        # If all flow nodes turned on, nothing more to be done.
+        return PathPressure(pressure=0, actions=[])
+    ckey = _build_cache_key(players=players, cur_time=cur_time, turned_on=turned_on)
+    if ckey in cache:
+        return cache[ckey]
+    best_adj_kwargs = dict(
+        player=player,
+        players=players,
+        turned_on=turned_on,
+        start_node=start_node,
+        flow_nodes=flow_nodes,
+        flow_dists=flow_dists,
+        graph=graph,
+        max_time=max_time,
+        cache=cache,
+        max_press=max_press,
+    )
+    if cur == start_node:
+        # don't open start node
+        best_pp = _best_adj(cur_time=cur_time, **best_adj_kwargs)
+    else:
+        # open the current valve option
+        turned_on.add(cur)
+        flow_rate = graph[cur].flow_rate
+        flow_from_cur = flow_rate * (max_time - cur_time - 1)
+        best_pp = _best_adj(cur_time=cur_time + 1, **best_adj_kwargs)
+        # say at time 0, we turn on the valve, it will take 1min, so we get the pressure for 29mins.
+        best_pp = PathPressure(
+            pressure=best_pp.pressure + flow_from_cur,
+            actions=best_pp.actions[:],
+        )
+        best_pp.actions.append(
+            f"Time={cur_time}: Player {player.num} opens valve {cur} flow_rate={flow_rate} total flow={flow_from_cur}."
+        )
+        turned_on.discard(cur)
+    cache[ckey] = best_pp
+    max_press.pressure = max(max_press.pressure, best_pp.pressure)
+    return best_pp
+
+
+def _available_player(players, cur_time):
+    for p in players.values():
+        if p.next_time == cur_time:
+            return p
+    else:
+        raise RuntimeError("No player is available.")
+
+
+def _build_cache_key(
+    players: list[Player],
+    cur_time: int,
+    turned_on: set[str],
+):
+    player_pos = str(sorted((p.next_time, p.next_node) for p in players.values()))
+    return f"{cur_time};{player_pos};{sorted(turned_on)}"
+
+
+def _best_adj(
+    player: Player,
+    players: list[Player],
+    cur_time: int,
+    turned_on: set[str],
+    start_node: str,
+    flow_nodes: set[str],
+    flow_dists: dict[tuple[str, str], int],
+    graph: Graph,
+    max_time: int,
+    cache: dict[tuple[int, str, str], PathPressure],
+    max_press: MaxPressure,
+) -> PathPressure:
+    cur = player.next_node
+    player_dests = {p.next_node for p in players.values()}
+    adjs = [
+        adj
+        for adj in flow_nodes
+        if ((adj not in turned_on) and (adj not in player_dests))
+    ]
+    max_press_rec_kwargs = dict(
+        turned_on=turned_on,
+        start_node=start_node,
+        flow_nodes=flow_nodes,
+        flow_dists=flow_dists,
+        graph=graph,
+        max_time=max_time,
+        cache=cache,
+        max_press=max_press,
+    )
+    if not adjs:
+        best_press = _ended_press(
+            players=players, player=player, max_press_rec_kwargs=max_press_rec_kwargs
+        )
+    else:
+        best_adj, best_press = None, PathPressure(pressure=0, actions=[])
+        for adj in adjs:
+            new_players = copy.deepcopy(players)
+            new_players[player.num] = Player(
+                num=player.num,
+                next_node=adj,
+                next_time=cur_time + flow_dists[(cur, adj)],
+            )
+            next_time = _next_time(players=new_players)
+            press = max_pressure_rec(
+                players=new_players,
+                cur_time=next_time,
+                **max_press_rec_kwargs,
+            )
+            if press >= best_press:
+                best_adj, best_press = adj, press
+        if len(players) > 1:
+            # stopping here leaves the valves left to the other players
+            press = _ended_press(
+                players=players,
+                player=player,
+                max_press_rec_kwargs=max_press_rec_kwargs,
+            )
+            if press > best_press:
+                return press
+        best_press = copy.deepcopy(best_press)
+        best_press.actions.append(
+            f"Time={cur_time}: Player {player.num} moves from {cur} to {best_adj} in {flow_dists[(cur, best_adj)]}mins"
+        )
+    return best_press
+
+
+def _ended_press(
+    players: dict[str, Player], player: Player, max_press_rec_kwargs: dict
+) -> PathPressure:
+    """Best pressure of the other players once `player` stops moving."""
+    new_players = _ended_players(players=players, end_player_num=player.num)
+    next_time = _next_time(players=new_players)
+    if next_time == float("inf"):
+        return PathPressure(pressure=0, actions=[])
+    return max_pressure_rec(
+        players=new_players,
+        cur_time=next_time,
+        **max_press_rec_kwargs,
+    )
+
+
+def _next_time(players: dict[str, Player]) -> Union[int, float]:
+    return min(p.next_time for p in players.values())
+
+
+def _ended_players(
+    players: dict[str, Player], end_player_num: int
+) -> dict[str, Player]:
+    """Create a new dict of players with this player at end state"""
+    players = copy.deepcopy(players)
+    players[end_player_num] = Player(
+        num=end_player_num, next_node=None, next_time=float("inf")
+    )
+    return players
+
+
+if __name__ == "__main__":
+    main()
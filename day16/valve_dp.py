@@ -0,0 +1,232 @@
+"""Bitmask DP solver for the day16 valves
+
+The valves with a non-zero flow rate are indexed as bits of an opened-mask,
+the distance between every pair of valves comes from one Floyd-Warshall pass
+and the pressure is maximised with a DP over (valve, time, opened-mask) states
+packed into integer keys. For two players, the best pair of disjoint masks is
+picked from the single player table, as the players never open the same valve.
+
+Usage from the notebook::
+
+    import valve_dp
+
+    valve_dp.max_pressure_dp(graph=input_graph, num_players=2, max_time=26)
+"""
+import dataclasses
+
+from typing import Any
+from typing import Optional
+
+
+MAX_TIME = 30
+START_NODE = "AA"
+INF = float("inf")
+
+
+@dataclasses.dataclass(order=True, frozen=True)
+class PathPressure:
+    pressure: int
+    actions: list[Optional[str]]
+
+    def __deepcopy__(self, memo):
+        return PathPressure(pressure=self.pressure, actions=self.actions[:])
+
+    def __repr__(self):
+        return (
+            "PathPressure\n"
+            "------------\n\n"
+            f"Maximum pressure = {self.pressure}\n\n"
+        ) + "\n".join(self.actions)
+
+
+@dataclasses.dataclass
+class ValveTable:
+    """Best pressure for every opened-mask reachable by a single player.
+
+    `best[mask]` is the pressure and `best_key[mask]` the packed DP state it
+    was reached at, which is walked back through `parent` to rebuild actions.
+    """
+
+    names: list[str]
+    valves: list[int]
+    dists: list[list[float]]
+    flow_rates: list[int]
+    start: int
+    max_time: int
+    best: dict[int, int]
+    best_key: dict[int, int]
+    parent: dict[int, int]
+
+
+def max_pressure_dp(
+    graph: dict[str, Any],
+    max_time: int = MAX_TIME,
+    start_node: str = START_NODE,
+    num_players: int = 1,
+) -> PathPressure:
+    """Same answer as the notebook's `max_pressure_backtrack`, the start
+    valve is never opened even if it has a non-zero flow rate.
+
+    `graph` maps the valve name to a node with `name`, `flow_rate` and `adjs`.
+    """
+    table = build_table(graph=graph, max_time=max_time, start_node=start_node)
+    if num_players == 1:
+        mask = max(table.best, key=table.best.__getitem__)
+        masks = [mask]
+    elif num_players == 2:
+        masks = list(_best_disjoint_pair(best=table.best))
+    else:
+        raise ValueError(f"Only 1 or 2 players are supported, got {num_players}")
+    actions = []
+    for player_num, mask in enumerate(masks):
+        actions.extend(_actions(table=table, mask=mask, player_num=player_num))
+    return PathPressure(
+        pressure=sum(table.best[m] for m in masks),
+        actions=[act for _, act in sorted(actions)],
+    )
+
+
+def build_table(graph: dict[str, Any], max_time: int, start_node: str) -> ValveTable:
+    names = sorted(graph)
+    dists = floyd_warshall(graph=graph, names=names)
+    flow_rates = [graph[nm].flow_rate for nm in names]
+    start = names.index(start_node)
+    # like the backtracker, the start valve is never opened
+    valves = [ix for ix, fr in enumerate(flow_rates) if fr > 0 and ix != start]
+    best, best_key, parent = _run_dp(
+        valves=valves,
+        dists=dists,
+        flow_rates=flow_rates,
+        start=start,
+        max_time=max_time,
+    )
+    return ValveTable(
+        names=names,
+        valves=valves,
+        dists=dists,
+        flow_rates=flow_rates,
+        start=start,
+        max_time=max_time,
+        best=best,
+        best_key=best_key,
+        parent=parent,
+    )
+
+
+def floyd_warshall(graph: dict[str, Any], names: list[str]) -> list[list[float]]:
+    """All-pairs shortest distances between the valves in one pass."""
+    ixs = {nm: ix for ix, nm in enumerate(names)}
+    n = len(names)
+    dists = [[INF] * n for _ in range(n)]
+    for nm, ix in ixs.items():
+        dists[ix][ix] = 0
+        for adj in graph[nm].adjs:
+            dists[ix][ixs[adj]] = 1
+    for k in range(n):
+        dk = dists[k]
+        for i in range(n):
+            di, dik = dists[i], dists[i][k]
+            if dik == INF:
+                continue
+            for j in range(n):
+                if dik + dk[j] < di[j]:
+                    di[j] = dik + dk[j]
+    return dists
+
+
+def _run_dp(
+    valves: list[int],
+    dists: list[list[float]],
+    flow_rates: list[int],
+    start: int,
+    max_time: int,
+) -> tuple[dict[int, int], dict[int, int], dict[int, int]]:
+    """Forward DP over (time, valve bit, opened-mask), processed in time order.
+
+    A state is the moment a player has just opened a valve (or is at the start
+    at time 0). Every move goes to an unopened valve and opens it, so time only
+    increases and each time layer is final once we reach it.
+    """
+    nbits = len(valves)
+    # the start node sits at bit position `nbits` so it never shares a valve bit
+    pos_valves = valves + [start]
+    start_key = _pack(t=0, pos=nbits, mask=0, nbits=nbits)
+    layers: dict[int, dict[int, int]] = {0: {start_key: 0}}
+    best, best_key, parent = {0: 0}, {0: start_key}, {}
+    for t in range(max_time):
+        for key, press in layers.pop(t, {}).items():
+            _, pos, mask = _unpack(key=key, nbits=nbits)
+            if press > best.get(mask, -1):
+                best[mask], best_key[mask] = press, key
+            src = pos_valves[pos]
+            for bit, valve in enumerate(valves):
+                if mask >> bit & 1:
+                    continue
+                # move to the valve and take a minute to open it
+                new_t = t + dists[src][valve] + 1
+                if new_t >= max_time:
+                    continue
+                new_press = press + flow_rates[valve] * (max_time - new_t)
+                new_key = _pack(t=new_t, pos=bit, mask=mask | 1 << bit, nbits=nbits)
+                layer = layers.setdefault(new_t, {})
+                if new_press > layer.get(new_key, -1):
+                    layer[new_key] = new_press
+                    parent[new_key] = key
+    return best, best_key, parent
+
+
+def _pack(t: int, pos: int, mask: int, nbits: int) -> int:
+    return ((t * (nbits + 1) + pos) << nbits) | mask
+
+
+def _unpack(key: int, nbits: int) -> tuple[int, int, int]:
+    t, pos = divmod(key >> nbits, nbits + 1)
+    return t, pos, key & ((1 << nbits) - 1)
+
+
+def _best_disjoint_pair(best: dict[int, int]) -> tuple[int, int]:
+    """Best two masks that do not share a valve, the masks are visited in
+    descending pressure so both loops can stop early.
+    """
+    ranked = sorted(best.items(), key=lambda kv: -kv[1])
+    best_pair, best_press = (0, 0), 0
+    for i, (mask1, press1) in enumerate(ranked):
+        if press1 * 2 <= best_press:
+            break
+        for mask2, press2 in ranked[i:]:
+            if press1 + press2 <= best_press:
+                break
+            if mask1 & mask2 == 0:
+                best_pair, best_press = (mask1, mask2), press1 + press2
+    return best_pair
+
+
+def _actions(table: ValveTable, mask: int, player_num: int) -> list[tuple[int, str]]:
+    """Walks the DP parents back from the best state of `mask` and returns
+    the `PathPressure` actions of this player keyed by time.
+    """
+    nbits = len(table.valves)
+    pos_names = [table.names[v] for v in table.valves] + [table.names[table.start]]
+    key, actions = table.best_key[mask], []
+    while key in table.parent:
+        prev_key = table.parent[key]
+        t, pos, _ = _unpack(key=key, nbits=nbits)
+        prev_t, prev_pos, _ = _unpack(key=prev_key, nbits=nbits)
+        src, dst = pos_names[prev_pos], pos_names[pos]
+        open_t, flow_rate = t - 1, table.flow_rates[table.valves[pos]]
+        actions.append(
+            (
+                open_t,
+                f"Time={open_t}: Player {player_num} opens valve {dst} "
+                f"flow_rate={flow_rate} total flow={flow_rate * (table.max_time - t)}.",
+            )
+        )
+        actions.append(
+            (
+                prev_t,
+                f"Time={prev_t}: Player {player_num} moves from {src} to {dst} "
+                f"in {open_t - prev_t}mins",
+            )
+        )
+        key = prev_key
+    return actions
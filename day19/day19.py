@@ -1,186 +1,545 @@
+"""Advent of code 2022 day 19 solution
+
+https://adventofcode.com/2022/day/19
+
+Usage::
+
+    # Part 1 over every blueprint and part 2 over the first 3, 4 workers
+    python -m day19.day19 --file day19/input.txt --workers 4
+
+    # Stream the per blueprint results to a JSONL file
+    python -m day19.day19 --file day19/input.txt --out day19/results.jsonl
+
+    # The jump search without pruning, to measure what the pruning saves
+    python -m day19.day19 --file day19/input.txt --no-prune
+
+    # Minute by minute search with a memo of at most 1M states
+    python -m day19.day19 --file day19/input.txt --search step --cache-size 1000000
+"""
 import multiprocessing as mpl
 
+import collections
 import json
-from copy import deepcopy
+import os
+import sys
+import util
 import time
 import functools as ft
 import tqdm
 import re
 
+from dataclasses import asdict
+from dataclasses import dataclass
+from typing import NamedTuple
+from typing import Optional
 
-def parse_raw_input(fl):
-    bps = {}
-    input_lns = open("input.txt").read().splitlines()
-    for ln in input_lns:
-        (
-            bp_id,
-            ore_rbt_ore_cost,
-            cly_rbt_ore_cost,
-            obs_rbt_ore_cost,
-            obs_rbt_clay_cost,
-            geode_rbt_ore_cost,
-            geode_rbt_obs_cost,
-        ) = (
-            int(n)
-            for n in re.findall(
-                r"Blueprint (\d+): Each ore robot costs (\d+) ore. Each clay robot costs (\d+) ore. Each obsidian robot costs (\d+) ore and (\d+) clay. Each geode robot costs (\d+) ore and (\d+) obsidian.",
-                ln,
-            )[0]
-        )
-        bps[bp_id] = {
-            "ore_robot": {"ore": ore_rbt_ore_cost},
-            "clay_robot": {"ore": cly_rbt_ore_cost},
-            "obsidian_robot": {"ore": obs_rbt_ore_cost, "clay": obs_rbt_clay_cost},
-            "geode_robot": {"ore": geode_rbt_ore_cost, "obsidian": geode_rbt_obs_cost},
-        }
-    return bps
+
+RSRCS = ("ore", "clay", "obsidian", "geode")
+ORE, CLAY, OBSIDIAN, GEODE = range(len(RSRCS))
+
+
+class State(NamedTuple):
+    """Immutable search state, hashable so that it is its own memo key."""
+
+    time: int
+    ore: int
+    clay: int
+    obsidian: int
+    geode: int
+    ore_rate: int
+    clay_rate: int
+    obsidian_rate: int
+    geode_rate: int
 
 
-def default_player():
-    return dict(
+class Blueprint(NamedTuple):
+    """`costs[bot]` is the (ore, clay, obsidian) cost of the robot collecting
+    `RSRCS[bot]` and `max_reqs[rsrc]` the most of a resource any robot costs.
+    """
+
+    costs: tuple[tuple[int, int, int], ...]
+    max_reqs: tuple[int, int, int]
+
+
+def default_player() -> State:
+    return State(
+        time=0,
         ore=0,
         clay=0,
         obsidian=0,
         geode=0,
-        rate=dict(
-            ore=1,
-            clay=0,
-            obsidian=0,
-            geode=0,
-        ),
+        ore_rate=1,
+        clay_rate=0,
+        obsidian_rate=0,
+        geode_rate=0,
+    )
+
+
+def compile_blueprint(bp) -> Blueprint:
+    """Blueprint from a {"ore_robot": {"ore": 4}, ...} dict."""
+    return _blueprint(
+        costs=tuple(
+            tuple(bp[f"{bot}_robot"].get(rsrc, 0) for rsrc in RSRCS[:GEODE])
+            for bot in RSRCS
+        )
+    )
+
+
+def _blueprint(costs) -> Blueprint:
+    return Blueprint(
+        costs=costs,
+        max_reqs=tuple(max(cost[rsrc] for cost in costs) for rsrc in range(GEODE)),
+    )
+
+
+BLUEPRINT_RE = re.compile(
+    r"Blueprint (\d+):\s+"
+    r"Each ore robot costs (\d+) ore.\s+"
+    r"Each clay robot costs (\d+) ore.\s+"
+    r"Each obsidian robot costs (\d+) ore and (\d+) clay.\s+"
+    r"Each geode robot costs (\d+) ore and (\d+) obsidian."
+)
+
+
+def parse_raw_input(fl) -> dict[int, Blueprint]:
+    return dict(iter_blueprints(fl))
+
+
+def iter_blueprints(fl, chunk_size=1 << 20):
+    """Yields (bp_id, Blueprint) from a path or an open text file.
+
+    The file is read in chunks and the precompiled pattern is run over each
+    chunk with finditer, so a blueprint may span lines or chunks. Whatever
+    is left after the last match is carried over to the next chunk.
+    """
+    infile = open(fl) if isinstance(fl, (str, os.PathLike)) else fl
+    try:
+        buf = ""
+        while chunk := infile.read(chunk_size):
+            buf += chunk
+            end = 0
+            for m in BLUEPRINT_RE.finditer(buf):
+                yield _to_blueprint(m)
+                end = m.end()
+            buf = buf[end:]
+    finally:
+        if infile is not fl:
+            infile.close()
+
+
+def _to_blueprint(m) -> tuple[int, Blueprint]:
+    (
+        bp_id,
+        ore_rbt_ore_cost,
+        cly_rbt_ore_cost,
+        obs_rbt_ore_cost,
+        obs_rbt_clay_cost,
+        geode_rbt_ore_cost,
+        geode_rbt_obs_cost,
+    ) = map(int, m.groups())
+    costs = (
+        (ore_rbt_ore_cost, 0, 0),
+        (cly_rbt_ore_cost, 0, 0),
+        (obs_rbt_ore_cost, obs_rbt_clay_cost, 0),
+        (geode_rbt_ore_cost, 0, geode_rbt_obs_cost),
     )
+    return bp_id, _blueprint(costs=costs)
 
 
-def parse_input(fl):
-    blue_prints = [json.loads(ln) for ln in open(fl).read().splitlines()]
+def parse_input(fl) -> dict[int, Blueprint]:
+    """Parses blueprints that were converted to JSON lines."""
     out = {}
-    for bp in blue_prints:
-        bp = deepcopy(bp)
-        bp_num = bp["Blueprint"]
-        del bp["Blueprint"]
-        out[bp_num] = bp
+    for ln in util.iter_fl(fl=fl):
+        bp = json.loads(ln)
+        out[bp["Blueprint"]] = compile_blueprint(bp)
     return out
 
 
-def max_geodes_bp(blueprint, max_time=24, toprint=False) -> int:
-    player = default_player()
+def harvest(s: State, mins: int = 1) -> State:
+    return State(
+        s.time + mins,
+        s.ore + s.ore_rate * mins,
+        s.clay + s.clay_rate * mins,
+        s.obsidian + s.obsidian_rate * mins,
+        s.geode + s.geode_rate * mins,
+        s.ore_rate,
+        s.clay_rate,
+        s.obsidian_rate,
+        s.geode_rate,
+    )
+
+
+def build(s: State, bot: int, cost: tuple[int, int, int]) -> State:
+    """Pays for the robot and adds it to the rates, time does not move."""
+    ore_cost, clay_cost, obs_cost = cost
+    return State(
+        s.time,
+        s.ore - ore_cost,
+        s.clay - clay_cost,
+        s.obsidian - obs_cost,
+        s.geode,
+        s.ore_rate + (bot == ORE),
+        s.clay_rate + (bot == CLAY),
+        s.obsidian_rate + (bot == OBSIDIAN),
+        s.geode_rate + (bot == GEODE),
+    )
+
+
+def max_geodes_bp(
+    blueprint,
+    max_time=24,
+    toprint=False,
+    search="step",
+    prune=True,
+    cache=None,
+    best=None,
+) -> int:
+    """search="step" walks minute by minute with a memo cache and
+    search="jump" skips ahead to the next robot build, optionally pruning
+    branches that cannot beat the best number of geodes found so far.
+
+    The step search memoizes in `cache`, an unbounded MemoCache by default.
+    Pass a bounded one to cap memory and read its stats afterwards. The jump
+    search keeps its best-so-far and states visited in `best`.
+    """
+    if search == "jump":
+        return max_geodes_jump(
+            bp=blueprint,
+            state=default_player(),
+            max_time=max_time,
+            best=Incumbent() if best is None else best,
+            prune=prune,
+        )
     return max_geodes_rec(
         bp=blueprint,
-        player=deepcopy(player),
-        cur_time=0,
+        state=default_player(),
         max_time=max_time,
-        cache={},
+        cache=MemoCache() if cache is None else cache,
         toprint=toprint,
     )
 
 
-def max_geodes_rec(bp, player, cur_time, max_time, cache, toprint) -> int:
-    if cur_time == max_time:
-        return player["geode"]
-    ckey = _cache_key(cur_time, player)
-    if ckey in cache:
-        return cache[ckey]
-    buildable_bots = list(buildable_robots(bp=bp, player=player))
-    _update_player_rsrc_inp(player=player)
-    dflt_kwargs = dict(
-        bp=bp, cur_time=cur_time + 1, cache=cache, toprint=toprint, max_time=max_time
-    )
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    peak_size: int = 0
+
+
+class MemoCache:
+    """Memo of the best geodes from a state, holding at most `maxsize` states
+    (unbounded if None) and evicting the least recently used state first.
+    """
+
+    def __init__(self, maxsize=None):
+        self.maxsize = maxsize
+        self.stats = CacheStats()
+        self._data = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, state):
+        val = self._data.get(state)
+        if val is None:
+            self.stats.misses += 1
+        else:
+            self.stats.hits += 1
+            self._data.move_to_end(state)
+        return val
+
+    def put(self, state, val):
+        self._data[state] = val
+        if self.maxsize is not None and len(self._data) > self.maxsize:
+            self._evict()
+        self.stats.peak_size = max(self.stats.peak_size, len(self._data))
+
+    def _evict(self):
+        self._data.popitem(last=False)
+        self.stats.evictions += 1
+
+
+class LayeredMemoCache(MemoCache):
+    """Evicts the whole layer of states of the latest minute when full. Those
+    states are closest to the end of the search and cheapest to recompute.
+    """
+
+    def __init__(self, maxsize=None):
+        super().__init__(maxsize=maxsize)
+        self._data = {}
+        self._layers = collections.defaultdict(set)
+
+    def get(self, state):
+        val = self._data.get(state)
+        if val is None:
+            self.stats.misses += 1
+        else:
+            self.stats.hits += 1
+        return val
+
+    def put(self, state, val):
+        self._layers[state.time].add(state)
+        super().put(state, val)
+
+    def _evict(self):
+        for old_state in self._layers.pop(max(self._layers)):
+            del self._data[old_state]
+            self.stats.evictions += 1
+
+
+MEMO_CACHES = {"lru": MemoCache, "layered": LayeredMemoCache}
+
+
+@dataclass
+class Incumbent:
+    geodes: int = 0
+    states: int = 0
+
+
+def max_geodes_jump(bp, state, max_time, best, prune) -> int:
+    """Branch and bound search where each branch picks the next robot to build
+    and jumps straight to the minute it is built, instead of branching on
+    build / no-build every minute.
+    """
+    best.states += 1
+    time_left = max_time - state.time
+    # geodes at the end if no more robots are built
+    best.geodes = max(best.geodes, state.geode + state.geode_rate * time_left)
+    if prune and _geodes_upper_bound(state=state, time_left=time_left) <= best.geodes:
+        return best.geodes
+    rates = (state.ore_rate, state.clay_rate, state.obsidian_rate)
+    # geode robots first, so a good incumbent is found early
+    for bot in reversed(range(len(RSRCS))):
+        if bot != GEODE and rates[bot] >= bp.max_reqs[bot]:
+            continue
+        wait = _mins_to_afford(cost=bp.costs[bot], state=state)
+        # the new robot has to be built with at least a minute left to be useful
+        if wait is None or wait + 1 >= time_left:
+            continue
+        max_geodes_jump(
+            bp=bp,
+            state=build(harvest(state, mins=wait + 1), bot=bot, cost=bp.costs[bot]),
+            max_time=max_time,
+            best=best,
+            prune=prune,
+        )
+    return best.geodes
+
+
+def _geodes_upper_bound(state, time_left):
+    """Optimistic bound: a new geode robot is built in every remaining minute."""
+    return state.geode + state.geode_rate * time_left + time_left * (time_left - 1) // 2
+
+
+def _mins_to_afford(cost, state):
+    """Minutes to wait until the robot can be paid for, None if never."""
+    wait = 0
+    for need, have, rate in zip(
+        cost,
+        (state.ore, state.clay, state.obsidian),
+        (state.ore_rate, state.clay_rate, state.obsidian_rate),
+    ):
+        if need <= have:
+            continue
+        if rate == 0:
+            return None
+        wait = max(wait, -((have - need) // rate))
+    return wait
+
+
+def max_geodes_rec(bp, state, max_time, cache, toprint) -> int:
+    if state.time == max_time:
+        return state.geode
+    cached = cache.get(state)
+    if cached is not None:
+        return cached
+    buildable_bots = list(buildable_robots(bp=bp, state=state))
+    harvested = harvest(state)
     build_opts = [
         max_geodes_rec(
-            player=_build_bot_inp(bot=bot, bot_reqs=bp[bot], player=deepcopy(player)),
-            **dflt_kwargs,
+            bp=bp,
+            state=build(harvested, bot=bot, cost=bp.costs[bot]),
+            max_time=max_time,
+            cache=cache,
+            toprint=toprint,
         )
         for bot in buildable_bots
     ]
     if toprint:
-        print(
-            f"Time: {cur_time}, {player}, buildable bots: {set(buildable_robots(bp=bp, player=player))}"
-        )
+        print(f"{state}, buildable bots: {[RSRCS[bot] for bot in buildable_bots]}")
     nobuild_geodes = max_geodes_rec(
-        player=deepcopy(player),
-        **dflt_kwargs,
+        bp=bp, state=harvested, max_time=max_time, cache=cache, toprint=toprint
     )
     build_geodes = max(build_opts) if build_opts else 0
     mx = max(build_geodes, nobuild_geodes)
-    cache[ckey] = mx
+    cache.put(state, mx)
     return mx
 
 
-def _bot_to_rsrc(bot):
-    if bot is None:
-        return None
-    return bot.rstrip("_robot")
+def buildable_robots(bp, state):
+    if _is_buildable(cost=bp.costs[GEODE], state=state):
+        yield GEODE
+        return
+    rates = (state.ore_rate, state.clay_rate, state.obsidian_rate)
+    for bot in range(GEODE):
+        # maximum required number of rsrcs tht is created by this bot
+        # if we already are producing max num, there's no point building
+        # more of such bots
+        if rates[bot] < bp.max_reqs[bot] and _is_buildable(
+            cost=bp.costs[bot], state=state
+        ):
+            yield bot
 
 
-def _build_bot_inp(bot, bot_reqs, player):
-    for rsrc, rsrc_cnt in bot_reqs.items():
-        player[rsrc] -= rsrc_cnt
-    player["rate"][_bot_to_rsrc(bot)] += 1
-    return player
+def _is_buildable(cost, state):
+    ore_cost, clay_cost, obs_cost = cost
+    return (
+        state.ore >= ore_cost and state.clay >= clay_cost and state.obsidian >= obs_cost
+    )
 
 
-def _update_player_rsrc_inp(player):
-    for rsrc, rate in player["rate"].items():
-        player[rsrc] += rate
+class BlueprintResult(NamedTuple):
+    """The memo cache stats are None for the jump search, which has no memo."""
 
+    bp_id: int
+    max_time: int
+    geodes: int
+    seconds: float
+    states_visited: int
+    hits: Optional[int] = None
+    misses: Optional[int] = None
+    evictions: Optional[int] = None
+    peak_size: Optional[int] = None
 
-def buildable_robots(bp, player):
-    if _is_buildable(bot_reqs=bp["geode_robot"], player=player):
-        yield "geode_robot"
-        return
-    for robot, reqs in bp.items():
-        if not _is_buildable(bot_reqs=reqs, player=player):
-            continue
-        if robot == "geode_robot":
-            yield robot
-            continue
-        # maximum required number of rsrcs tht is created by this bot
-        # if we already are producing max num, there's no point building
-        # more of such bots
-        bot_rsrc = _bot_to_rsrc(robot)
-        max_reqmt = max_rsrc_reqmt(bp=bp, bot_rsrc=bot_rsrc)
-        if player["rate"][bot_rsrc] < max_reqmt:
-            yield robot
 
+def wrapper(job, search="jump", prune=True, cache_size=None, cache_policy="lru"):
+    bp_id, bp, max_time = job
+    cache, best = MEMO_CACHES[cache_policy](maxsize=cache_size), Incumbent()
+    st = time.time()
+    mx = max_geodes_bp(
+        blueprint=bp,
+        max_time=max_time,
+        search=search,
+        prune=prune,
+        cache=cache,
+        best=best,
+    )
+    elp = time.time() - st
+    if search == "jump":
+        return BlueprintResult(
+            bp_id=bp_id,
+            max_time=max_time,
+            geodes=mx,
+            seconds=elp,
+            states_visited=best.states,
+        )
+    return BlueprintResult(
+        bp_id=bp_id,
+        max_time=max_time,
+        geodes=mx,
+        seconds=elp,
+        states_visited=cache.stats.hits + cache.stats.misses,
+        **asdict(cache.stats),
+    )
 
-def max_rsrc_reqmt(bp, bot_rsrc):
-    return max(reqs.get(bot_rsrc, 0) for reqs in bp.values())
 
+def run_blueprints(jobs, workers, out, **wrapper_kwargs):
+    """Evaluates (bp_id, blueprint, max_time) jobs in a process pool.
 
-def _is_buildable(bot_reqs, player):
-    for rsrc, min_val in bot_reqs.items():
-        if player[rsrc] < min_val:
-            return False
-    else:
-        return True
+    Jobs are handed out one at a time, so an idle worker takes the next job as
+    soon as it is free, and the largest jobs are sent first so a long one
+    does not start last. Each result is written to `out` as a JSONL line as
+    soon as it finishes.
+    """
+    jobs = sorted(jobs, key=_estimated_work, reverse=True)
+    fn = ft.partial(wrapper, **wrapper_kwargs)
+    results = []
+    with mpl.Pool(workers) as p:
+        for res in tqdm.tqdm(p.imap_unordered(fn, jobs, chunksize=1), total=len(jobs)):
+            out.write(json.dumps(res._asdict()) + "\n")
+            out.flush()
+            results.append(res)
+    return results
 
 
-def _cache_key(cur_time, player):
-    p, rates = player, player["rate"]
-    return (
-        f"{cur_time}, {p['ore']}, {p['clay']}, {p['obsidian']}, {p['geode']}"
-        f"{rates['ore']}, {rates['clay']}, {rates['obsidian']}, {rates['geode']} "
-    )
+def _estimated_work(job):
+    """Rough size of the search: cheaper robots mean more build options at
+    every step, and more minutes mean a deeper search.
+    """
+    _, bp, max_time = job
+    total_cost = sum(map(sum, bp.costs))
+    return (max_time, -total_cost)
 
 
-def wrapper(bp_id_bp, max_time):
-    bp_id, bp = bp_id_bp
-    return (bp_id, max_geodes_bp(blueprint=bp, max_time=max_time))
+def main():
+    opts = util.parse_args(
+        args={
+            "--workers": dict(help="Number of processes.", type=int, default=3),
+            "--num-blueprints": dict(
+                help="Evaluate only the first N blueprints.", type=int, default=None
+            ),
+            "--part2-blueprints": dict(
+                help="Blueprints evaluated for part 2.", type=int, default=3
+            ),
+            "--search": dict(
+                help=(
+                    "jump to the next robot build with pruning, or step minute by "
+                    "minute with a memo cache."
+                ),
+                choices=["jump", "step"],
+                default="jump",
+            ),
+            "--no-prune": dict(
+                help="Let the jump search explore the branches it would prune.",
+                action="store_true",
+            ),
+            "--cache-size": dict(
+                help="Most states in the step search's memo, unbounded by default.",
+                type=int,
+            ),
+            "--cache-policy": dict(
+                help="Which states the step search's memo evicts when full.",
+                choices=list(MEMO_CACHES),
+                default="lru",
+            ),
+            "--out": dict(help="JSONL file for the results, stdout by default."),
+        }
+    )
+    bps = list(parse_raw_input(opts.file).items())[: opts.num_blueprints]
+    jobs = [(bp_id, bp, 24) for bp_id, bp in bps]
+    jobs += [(bp_id, bp, 32) for bp_id, bp in bps[: opts.part2_blueprints]]
+    st = time.time()
+    out = open(opts.out, "w") if opts.out else sys.stdout
+    try:
+        results = run_blueprints(
+            jobs=jobs,
+            workers=opts.workers,
+            out=out,
+            search=opts.search,
+            prune=not opts.no_prune,
+            cache_size=opts.cache_size,
+            cache_policy=opts.cache_policy,
+        )
+    finally:
+        if opts.out:
+            out.close()
+    quality, score = 0, 1
+    for res in sorted(results):
+        if opts.search == "step":
+            util.log.info(
+                f"Blueprint {res.bp_id} in {res.max_time}m: {res.hits:,} hits, "
+                f"{res.misses:,} misses, {res.evictions:,} evictions, "
+                f"{res.peak_size:,} peak states in {res.seconds:.1f}s"
+            )
+        if res.max_time == 24:
+            quality += res.bp_id * res.geodes
+        else:
+            score *= res.geodes
+    util.log.info(f"Part 1 quality level sum: {quality}")
+    util.log.info(f"Part 2 geodes product: {score}")
+    util.log.info(f"Elapsed: {time.time() - st:.1f}s")
 
 
 if __name__ == "__main__":
-    test_bps = parse_input("parsed_test.txt")
-    input_bps = parse_raw_input("input.txt")
-    chosen_bps = list(input_bps.items())[:3]
-    mx_fn = ft.partial(wrapper, max_time=32)
-    st = time.time()
-    with mpl.Pool(3) as p:
-        vals = list(tqdm.tqdm(p.imap(mx_fn, chosen_bps), total=len(chosen_bps)))
-    for _id, mx in sorted(vals):
-        print(_id, mx)
-    print(dict(sorted(vals)))
-    score = 1
-    for _, mx in vals:
-        score *= mx
-    print("Score:", score)
-    print(f"Elapsed: {(time.time()-st)/60:.0f}m")
+    main()
@@ -0,0 +1,89 @@
+"""Advent of code 2022 day 2 solution
+
+https://adventofcode.com/2022/day/2
+
+A B C - opponent Rock paper scissor resply
+X Y Z - strategy 1 (`prob3.py`): our Rock paper scissor resply
+        strategy 2 (`prob4.py`): lose, draw, win resply
+
+There are only nine different rounds, so their scores are precomputed in a
+3x3 table per strategy and the file is scored by counting every round. The
+count engine runs one `bytes.count` per round over every block of the file,
+the numpy engine takes a histogram of the (opponent, ours) letters.
+
+Usage::
+
+    python -m day2.day2 --file day2/input.txt --strategy 1
+
+    python -m day2.day2 --file day2/input.txt --strategy 2 --engine numpy
+"""
+import time
+import util
+
+import numpy as np
+
+
+OPPONENT = b"ABC"
+OURS = b"XYZ"
+ROUNDS = [bytes([op, 32, our]) for op in OPPONENT for our in OURS]
+
+
+def main() -> None:
+    opts = util.parse_args(
+        args={
+            "--strategy": dict(
+                help="1 if XYZ is our hand, 2 if it is the result.",
+                type=int,
+                choices=[1, 2],
+                default=1,
+            ),
+            "--engine": dict(choices=["count", "numpy"], default="count"),
+        }
+    )
+    st = time.time()
+    table = score_table(strategy=opts.strategy)
+    score_fn = score_count if opts.engine == "count" else score_numpy
+    score = sum(
+        score_fn(block=block, table=table)
+        for block in util.iter_fl_blocks(fl=opts.file)
+    )
+    util.log.info(f"Expected score: {score}")
+    util.log.info(f"Elapsed: {time.time() - st:.3f}s")
+
+
+def score_table(strategy: int) -> np.ndarray:
+    """`table[op, our]` is the score of a round, with `op` and `our` the
+    index of the letters in ABC and XYZ.
+    """
+    table = np.zeros((3, 3), dtype=np.int64)
+    for op in range(3):
+        for our in range(3):
+            # with strategy 2, X Y Z are one hand before, the same or after
+            mine = our if strategy == 1 else (op + our - 1) % 3
+            # 0 if we lose, 1 if we draw and 2 if we win
+            result = (mine - op + 1) % 3
+            table[op, our] = mine + 1 + 3 * result
+    return table
+
+
+def score_count(block: bytes, table: np.ndarray) -> int:
+    """Score of the rounds in `block` with one `bytes.count` per round."""
+    counts = np.array([block.count(rnd) for rnd in ROUNDS], dtype=np.int64)
+    return int(counts @ table.ravel())
+
+
+def score_numpy(block: bytes, table: np.ndarray) -> int:
+    """Score of the rounds in `block` from a histogram of their letters. The
+    first and third byte of every non blank line are the letters.
+    """
+    buf = np.frombuffer(block, dtype=np.uint8)
+    starts = np.concatenate([[0], np.flatnonzero(buf == ord("\n")) + 1])
+    starts = starts[starts + 2 < len(buf)]
+    starts = starts[buf[starts] != ord("\n")]
+    kinds = (buf[starts] - OPPONENT[0]) * 3 + (buf[starts + 2] - OURS[0])
+    counts = np.bincount(kinds, minlength=9)
+    return int(counts @ table.ravel())
+
+
+if __name__ == "__main__":
+    main()
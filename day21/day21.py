@@ -0,0 +1,442 @@
+"""Advent of code 2022 day 21 solution
+
+https://adventofcode.com/2022/day/21
+
+The graph model and solvers are promoted from `day21.ipynb` so that they can
+run headless. Part 1 runs on the flat program of `day21.program` instead of a
+deep copy of the graph.
+
+Usage::
+
+    # Part 1, the number yelled by root
+    python -m day21.day21 --file day21/input.txt
+
+    # Part 2, the number humn has to yell for root's children to match
+    python -m day21.day21 --file day21/input.txt --part 2
+
+    # Part 2 with the notebook's equation solver
+    python -m day21.day21 --file day21/input.txt --part 2 --solver eqn
+"""
+import copy
+import re
+import time
+import util
+
+from dataclasses import dataclass
+from dataclasses import field
+from typing import NewType
+from typing import Optional
+from typing import Union
+
+from day21 import program
+
+
+LINE_RE = re.compile(r"(\w+) ([\+\*-/]) (\w+)")
+
+
+class UnsolvableExpection(ValueError):
+    pass
+
+
+def do_op(lt: int, rt: int, op: str) -> int:
+    if op == "+":
+        return lt + rt
+    elif op == "-":
+        return lt - rt
+    elif op == "*":
+        return lt * rt
+    elif op == "/":
+        return lt // rt
+    else:
+        raise ValueError(f"Unknown operation {op}")
+
+
+@dataclass
+class Eqn:
+
+    lt: "Node"
+    rt: "Node"
+    out: "Node"
+    op: str
+    nodes: Optional[set["Node"]] = None
+
+    def __post_init__(self) -> None:
+        self.nodes = set([self.lt, self.rt, self.out])
+
+    def __repr__(self) -> str:
+        return f"Eqn({self.lt.name} {self.op} {self.rt.name} = {self.out.name})"
+
+    def __hash__(self) -> int:
+        return hash(id(self))
+
+    def __deepcopy__(self, memo):
+        cls = self.__class__
+        result = cls.__new__(cls)
+        memo[id(self)] = result
+        for k, v in self.__dict__.items():
+            setattr(result, k, copy.deepcopy(v, memo))
+        return result
+
+    @staticmethod
+    def is_solved(eqn: "Eqn") -> bool:
+        return Eqn.count_knowns(eqn) == 3
+
+    @staticmethod
+    def count_knowns(eqn) -> int:
+        return sum(bool(n.val is not None) for n in eqn.nodes)
+
+    @staticmethod
+    def is_solvable(eqn: "Eqn") -> bool:
+        knowns = Eqn.count_knowns(eqn=eqn)
+        if knowns < 2:
+            return False
+        elif knowns == 2:
+            return True
+        else:
+            raise ValueError("Already solved")
+
+    @staticmethod
+    def solve_for_unknown(eqn: "Eqn") -> None:
+        """Of the 3 nodes in the equation, if we know 2,
+        it will update the `val` of the node in place.
+
+        `Side-effect`
+        """
+        if not Eqn.is_solvable(eqn=eqn):
+            raise UnsolvableExpection(f"{repr(eqn)} is not solvable")
+        opposite_op = {"+": "-", "-": "+", "*": "/", "/": "*"}
+        if eqn.out.val is None:
+            eqn.out.val = do_op(lt=eqn.lt.val, rt=eqn.rt.val, op=eqn.op)
+        elif eqn.lt.val is None:
+            # a = b / c => b = a * c; a = b + c => b = a - c
+            eqn.lt.val = do_op(lt=eqn.out.val, rt=eqn.rt.val, op=opposite_op[eqn.op])
+        elif eqn.rt.val is None:
+            if eqn.op in {"+", "*"}:
+                # a = b + c => c = a - b; a = b * c => c = a / b
+                eqn.rt.val = do_op(
+                    lt=eqn.out.val, rt=eqn.lt.val, op=opposite_op[eqn.op]
+                )
+            else:
+                # "-", "/"
+                # a = b - c => c = b - a; a = b / c => c = b / a
+                eqn.rt.val = do_op(lt=eqn.lt.val, rt=eqn.out.val, op=eqn.op)
+        else:
+            raise RuntimeError("Should never happen")
+
+
+@dataclass
+class Node:
+    name: str
+    is_leaf: bool = field(init=False)
+    val: Optional[int] = None
+    lt: Optional[Union[str, "Node"]] = None
+    rt: Optional[Union[str, "Node"]] = None
+    out: Optional["Node"] = None
+    op: Optional[str] = None
+    eqns: set["Eqn"] = field(default_factory=set)
+
+    def __post_init__(self) -> None:
+        self.is_leaf = self.op is None
+
+    @property
+    def _prev(self):
+        return set([self.lt, self.rt])
+
+    def __repr__(self) -> str:
+        lt = _node_name(self.lt)
+        rt = _node_name(self.rt)
+        out = _node_name(self.out)
+        return (
+            f"Node(name={self.name}, val={self.val}, "
+            f"lt={lt}, rt={rt}, op={self.op}, out={out}, "
+            f"eqns={self.eqns}"
+        )
+
+    def __hash__(self) -> int:
+        return hash(self.name)
+
+    def __deepcopy__(self, memo):
+        cls = self.__class__
+        result = cls.__new__(cls)
+        memo[id(self)] = result
+        for k, v in self.__dict__.items():
+            setattr(result, k, copy.deepcopy(v, memo))
+        return result
+
+    def __eq__(self, other) -> bool:
+        return self.name == other.name
+
+
+def _node_name(n: Node) -> str:
+    if n is None:
+        return n
+    elif isinstance(n, str):
+        return n
+    else:
+        return n.name
+
+
+Graph = NewType("Graph", dict[str, Node])
+
+
+def main() -> None:
+    opts = util.parse_args(
+        args={
+            "--part": dict(help="Puzzle part.", type=int, choices=[1, 2], default=1),
+            "--solver": dict(
+                help="Part 2 solver, the notebook's equation walk or linear forms.",
+                choices=["eqn", "linear"],
+                default="linear",
+            ),
+            "--input-node": dict(help="Monkey to solve for.", default="humn"),
+            "--output-node": dict(
+                help="Monkey whose operands have to match.", default="root"
+            ),
+        }
+    )
+    st = time.time()
+    graph = parse_fl(fl=opts.file)
+    util.log.info(f"Parsed {len(graph):,} monkeys in {time.time() - st:.3f}s")
+    st = time.time()
+    graph_ts = topological_sort(graph=graph)
+    util.log.info(f"Sorted {len(graph_ts):,} monkeys in {time.time() - st:.3f}s")
+    st = time.time()
+    if opts.part == 1:
+        answer = find_root_val(graph=graph, graph_ts=graph_ts)
+    elif opts.solver == "linear":
+        answer = program.solve_linear(
+            prog=program.compile_graph(graph_ts=graph_ts),
+            input_nm=opts.input_node,
+            output_nm=opts.output_node,
+        )
+    else:
+        answer = solve_prob2(
+            graph=graph, input_nm=opts.input_node, output_nm=opts.output_node
+        )[opts.input_node].val
+    util.log.info(f"Solved part {opts.part} in {time.time() - st:.3f}s")
+    util.log.info(f"Answer: {answer}")
+
+
+def parse_fl(fl) -> Graph:
+    g = {}
+    with open(fl) as infile:
+        for ln in infile:
+            name, val_str = ln.split(":")
+            try:
+                g[name] = Node(name=name, val=int(val_str))
+            except ValueError:
+                # operation node
+                lt, op, rt = LINE_RE.findall(val_str)[0]
+                g[name] = Node(name=name, lt=lt, rt=rt, op=op)
+    _link_nodes(graph=g)
+    return g
+
+
+def copy_graph(graph: Graph) -> Graph:
+    """Same as `copy.deepcopy(graph)` but built node by node, deepcopy
+    recurses along the operands and overflows the stack on deep graphs.
+    """
+    g = {
+        name: Node(
+            name=name,
+            val=node.val,
+            lt=_node_name(node.lt),
+            rt=_node_name(node.rt),
+            op=node.op,
+        )
+        for name, node in graph.items()
+    }
+    _link_nodes(graph=g)
+    return g
+
+
+def _link_nodes(graph: Graph) -> None:
+    """Replaces the operand names of the nodes with the nodes and adds the
+    equations.
+
+    `Side-effect`
+    """
+    for node in graph.values():
+        if node.is_leaf:
+            continue
+        node.lt = graph[node.lt]
+        node.rt = graph[node.rt]
+        node.lt.out = node
+        node.rt.out = node
+        eqn = Eqn(lt=node.lt, rt=node.rt, out=node, op=node.op)
+        node.lt.eqns.add(eqn)
+        node.rt.eqns.add(eqn)
+        node.eqns.add(eqn)
+
+
+def topological_sort(graph: Graph) -> list[Node]:
+    """Nodes in depth first post-order, left operand first. Walks an explicit
+    stack so the depth of the graph is not bound by the recursion limit.
+    """
+    output, seen = [], set()
+    for root in graph.values():
+        if root in seen:
+            continue
+        seen.add(root)
+        stack = [root]
+        while stack:
+            node = stack[-1]
+            for child in (node.lt, node.rt):
+                if child and child not in seen:
+                    seen.add(child)
+                    stack.append(child)
+                    break
+            else:
+                output.append(stack.pop())
+    return output
+
+
+def populate_graph(graph: Graph, dont_pop_nodes: Optional[set[Node]] = None) -> Graph:
+    """Populates the DAG after performing operations.
+
+    Will not populate nodes of graph which depend on nodes in `dont_pop_nodes`
+    """
+    dont_pop_nodes = dont_pop_nodes if dont_pop_nodes else set()
+    graph = copy_graph(graph)
+    graph_ts = topological_sort(graph)
+    for node in graph_ts:
+        if (
+            node.val is not None
+            or node in dont_pop_nodes
+            or node.lt.val is None
+            or node.rt.val is None
+        ):
+            continue
+        node.val = do_op(lt=node.lt.val, rt=node.rt.val, op=node.op)
+    return graph
+
+
+def find_root_val(graph: Graph, graph_ts: Optional[list[Node]] = None) -> int:
+    """Evaluates the compiled graph, the graph itself is left untouched."""
+    graph_ts = graph_ts or topological_sort(graph)
+    prog = program.compile_graph(graph_ts=graph_ts)
+    return program.evaluate(prog=prog)["root"]
+
+
+def nodes_caused_by(graph: Graph, node: Union[str, Node]) -> set[Node]:
+    """Find all the nodes that are caused by the target node.
+
+    For instance, say we are looking for the `humn` node. The nodes
+    directly affected by the human node are the nodes in the `out` variable
+    in the equations of `humn`. Then we follow the out of those variables
+    until we have seen all the nodes.
+
+    The return set will include the target_node itself.
+    """
+    if isinstance(node, str):
+        node = graph[node]
+    caused, stack = {node}, [node]
+    while stack:
+        for eqn in stack.pop().eqns:
+            if eqn.out in caused:
+                continue
+            caused.add(eqn.out)
+            stack.append(eqn.out)
+    return caused
+
+
+def solve_graph(
+    graph: Graph, output_node: str, input_node: str, ignore_nodes: set[Node] = None
+) -> set[Node]:
+    """Solves the equations in a graph until we can populate the input_node.
+
+    :param final_node: This is the output_node whose value we know.
+    :param input_node: The input node whose value we need to  determine so that
+        it causes the final_node to be of value we have given it.
+    """
+    ignore_nodes = ignore_nodes or set()
+    tmp_graph = copy_graph(graph)
+    tmp_graph[input_node].val = None
+    solved_graph = populate_graph(
+        graph=tmp_graph,
+        dont_pop_nodes=nodes_caused_by(graph=tmp_graph, node=input_node),
+    )
+    _solve_down(
+        known_root=solved_graph[output_node],
+        input_node=graph[input_node],
+        graph=solved_graph,
+        ignore_nodes=ignore_nodes,
+    )
+    return solved_graph
+
+
+def _solve_down(
+    known_root: Node, input_node: Node, graph: Graph, ignore_nodes: set[Node]
+) -> None:
+    """Solves the unknown operand of every equation from `known_root` down to
+    the input node. The equations still to visit of every node on the way
+    are kept on an explicit stack, so deep graphs do not recurse.
+    """
+    stack = [(known_root, iter(known_root.eqns))]
+    while stack:
+        known, eqns = stack[-1]
+        eqn = next(eqns, None)
+        if eqn is None:
+            stack.pop()
+            continue
+        lt, rt = known.lt, known.rt
+        if lt.is_leaf and rt.is_leaf and lt != input_node and rt != input_node:
+            # Even though the input node is a leaf we should still compute it
+            continue
+        if eqn.nodes & ignore_nodes:
+            continue
+        if Eqn.is_solved(eqn):
+            continue
+        _handle_solve_exc(known, eqn)
+        next_node = lt if lt.val is None else rt
+        Eqn.solve_for_unknown(eqn=eqn)
+        if not next_node.is_leaf:
+            # This will happen for the input node
+            stack.append((next_node, iter(next_node.eqns)))
+
+
+def _handle_solve_exc(known_root, eqn):
+    if not Eqn.is_solvable(eqn):
+        raise ValueError(f"{known_root}'s eqn {eqn} should be solvable\n" f"")
+
+
+def solve_prob2(graph, input_nm="humn", output_nm="root"):
+    input_caused_nodes = nodes_caused_by(graph=graph, node=input_nm)
+    # populate_graph works on a copy, the input graph is left untouched
+    solved_graph = populate_graph(
+        graph=graph,
+        dont_pop_nodes=input_caused_nodes,
+    )
+    # Set the input node to None, it's descendent node attached to root to the true value.
+    rchild_labels = _label_root_children(
+        graph=solved_graph,
+        input_caused_nodes=input_caused_nodes,
+        output_nm=output_nm,
+    )
+    solved_graph[input_nm].val = None
+    human_csd_rchild = solved_graph[rchild_labels["human_caused"]]
+    human_csd_rchild.val = solved_graph[rchild_labels["truth"]].val
+    _solve_down(
+        known_root=human_csd_rchild,
+        input_node=solved_graph[input_nm],
+        graph=solved_graph,
+        ignore_nodes={solved_graph[output_nm]},
+    )
+    return solved_graph
+
+
+def _label_root_children(graph, input_caused_nodes, output_nm):
+    """Finds the node the root should copy. This is the node that is an
+    input to `root` but is not caused by `input_node_nm` (`humn`).
+
+    {"human_caused": Node(), "truth": Node()}
+    """
+    output_node = graph[output_nm]
+    if output_node.lt in input_caused_nodes:
+        return {"human_caused": output_node.lt.name, "truth": output_node.rt.name}
+    else:
+        return {"human_caused": output_node.rt.name, "truth": output_node.lt.name}
+
+
+if __name__ == "__main__":
+    main()
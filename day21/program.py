@@ -0,0 +1,321 @@
+"""Flat array program compiled from the day21 monkey graph
+
+Every monkey gets an id in topological order, so the numbers one monkey
+needs are always computed before it. The program is three arrays, the
+opcode and the two operand ids of every monkey, plus the numbers yelled by
+the leaf monkeys. Evaluating it is one loop over the arrays with no graph
+copies.
+
+The monkeys are also ordered by depth, the longest path from a leaf, so
+every run of monkeys with the same depth and operation can be evaluated
+with one numpy operation, for many inputs at once.
+
+`what_if` sweeps one input over many numbers and only recomputes the
+monkeys that depend on it. `solve_linear` inverts the program in the same single pass, carrying the
+monkeys that depend on the input as exact linear forms `a*humn + b`.
+
+Usage from the notebook::
+
+    from day21 import program
+
+    prog = program.compile_graph(graph_ts=topological_sort(input_graph))
+    program.evaluate(prog=prog)["root"]
+    program.evaluate_many(prog=prog, values={"humn": np.arange(1000)})
+    program.what_if(prog=prog, values=np.arange(-1000, 1000), input_nm="humn")
+    program.solve_linear(prog=prog, input_nm="humn", output_nm="root")
+"""
+import operator
+
+from dataclasses import dataclass
+from fractions import Fraction
+from typing import Any
+from typing import Optional
+
+import numpy as np
+
+
+OPS = ["+", "-", "*", "/"]
+LEAF = -1
+PY_OPS = [operator.add, operator.sub, operator.mul, operator.floordiv]
+NP_OPS = [np.add, np.subtract, np.multiply, np.floor_divide]
+
+
+class NonLinearError(ValueError):
+    pass
+
+
+@dataclass
+class Program:
+    """`opcodes[i]` indexes `OPS`, or is `LEAF` for a monkey yelling
+    `consts[i]`. `runs` are the (start, stop, opcode) slices of monkeys with
+    the same depth and operation, in evaluation order.
+    """
+
+    names: list[str]
+    ids: dict[str, int]
+    opcodes: np.ndarray
+    lts: np.ndarray
+    rts: np.ndarray
+    consts: list[Optional[int]]
+    runs: list[tuple[int, int, int]]
+
+
+def compile_graph(graph_ts: list[Any]) -> Program:
+    """Compiles the nodes of a graph in topological order."""
+    depths = {}
+    for node in graph_ts:
+        depths[node.name] = (
+            0 if node.is_leaf else 1 + max(depths[node.lt.name], depths[node.rt.name])
+        )
+    # a stable sort keeps the topological order within a depth
+    nodes = sorted(
+        graph_ts,
+        key=lambda nd: (depths[nd.name], LEAF if nd.is_leaf else OPS.index(nd.op)),
+    )
+    names = [nd.name for nd in nodes]
+    ids = {nm: ix for ix, nm in enumerate(names)}
+    opcodes = np.array(
+        [LEAF if nd.is_leaf else OPS.index(nd.op) for nd in nodes], dtype=np.int8
+    )
+    lts = np.array([LEAF if nd.is_leaf else ids[nd.lt.name] for nd in nodes])
+    rts = np.array([LEAF if nd.is_leaf else ids[nd.rt.name] for nd in nodes])
+    return Program(
+        names=names,
+        ids=ids,
+        opcodes=opcodes,
+        lts=lts,
+        rts=rts,
+        consts=[nd.val if nd.is_leaf else None for nd in nodes],
+        runs=_runs(nodes=nodes, depths=depths, opcodes=opcodes),
+    )
+
+
+def _runs(nodes, depths, opcodes) -> list[tuple[int, int, int]]:
+    runs, start = [], 0
+    for ix in range(1, len(nodes) + 1):
+        if ix == len(nodes) or (
+            (depths[nodes[ix].name], opcodes[ix])
+            != (depths[nodes[start].name], opcodes[start])
+        ):
+            if opcodes[start] != LEAF:
+                runs.append((start, ix, int(opcodes[start])))
+            start = ix
+    return runs
+
+
+def evaluate(prog: Program, values: Optional[dict[str, int]] = None) -> dict[str, int]:
+    """Number yelled by every monkey with Python ints, so it never overflows.
+
+    `values` overrides the numbers of any monkeys, e.g. {"humn": 301}, an
+    overridden monkey is not computed from its operands.
+    """
+    vals = list(prog.consts)
+    overridden = set()
+    for nm, val in (values or {}).items():
+        vals[prog.ids[nm]] = val
+        overridden.add(prog.ids[nm])
+    ops, lts, rts = prog.opcodes.tolist(), prog.lts.tolist(), prog.rts.tolist()
+    for ix, op in enumerate(ops):
+        if op != LEAF and ix not in overridden:
+            vals[ix] = PY_OPS[op](vals[lts[ix]], vals[rts[ix]])
+    return dict(zip(prog.names, vals))
+
+
+def evaluate_many(
+    prog: Program, values: dict[str, np.ndarray], output_nm: str = "root"
+) -> np.ndarray:
+    """Number yelled by `output_nm` for every column of `values`, a 1d array
+    of numbers per overridden leaf monkey, evaluated one run at a time.
+
+    The numbers are int64, like do_op's `//` the division rounds down.
+    """
+    num = len(next(iter(values.values())))
+    consts = np.array([val or 0 for val in prog.consts], dtype=np.int64)
+    vals = np.repeat(consts[:, None], num, axis=1)
+    for nm, val in values.items():
+        vals[prog.ids[nm]] = val
+    for start, stop, op in prog.runs:
+        NP_OPS[op](
+            vals[prog.lts[start:stop]],
+            vals[prog.rts[start:stop]],
+            out=vals[start:stop],
+        )
+    return vals[prog.ids[output_nm]]
+
+
+def caused_by(prog: Program, input_nm: str) -> np.ndarray:
+    """Mask of the monkeys that depend on `input_nm`, itself included. The
+    same monkeys as the notebook's `nodes_caused_by`, one run at a time.
+    """
+    in_ix = prog.ids[input_nm]
+    caused = np.zeros(len(prog.names), dtype=bool)
+    caused[in_ix] = True
+    for start, stop, _ in prog.runs:
+        caused[start:stop] = caused[prog.lts[start:stop]] | caused[prog.rts[start:stop]]
+        # an input that is not a leaf is in a run, its operands do not matter
+        caused[in_ix] = True
+    return caused
+
+
+def what_if(
+    prog: Program,
+    values: np.ndarray,
+    input_nm: str = "humn",
+    output_nm: str = "root",
+    dtype: Any = object,
+) -> np.ndarray:
+    """Number yelled by `output_nm` for every number in `values` yelled by
+    `input_nm`.
+
+    The monkeys that do not depend on the input are evaluated once, only the
+    ones that do get a row of numbers and are recomputed, one run at a time.
+    Division rounds down and raises ZeroDivisionError like do_op's `//`.
+    The default object dtype computes with Python ints that never overflow,
+    dtype=np.int64 is faster but silently wraps on large numbers.
+    """
+    caused = caused_by(prog=prog, input_nm=input_nm)
+    if not caused[prog.ids[output_nm]]:
+        raise ValueError(f"{output_nm} does not depend on {input_nm}")
+    base_vals = np.array(_evaluate_uncaused(prog=prog, caused=caused), dtype=dtype)
+    rows = np.full(len(prog.names), -1)
+    rows[caused] = np.arange(caused.sum())
+    vals = np.empty((caused.sum(), len(values)), dtype=dtype)
+    in_ix = prog.ids[input_nm]
+    vals[rows[in_ix]] = values
+    for start, stop, op in prog.runs:
+        ixs = start + np.flatnonzero(caused[start:stop])
+        ixs = ixs[ixs != in_ix]
+        if not len(ixs):
+            continue
+        lt, rt = (
+            _operand_vals(ids=ids, caused=caused, rows=rows, vals=vals, base=base_vals)
+            for ids in (prog.lts[ixs], prog.rts[ixs])
+        )
+        if OPS[op] == "/" and (rt == 0).any():
+            raise ZeroDivisionError(f"{prog.names[ixs[0]]} divides by zero")
+        vals[rows[ixs]] = NP_OPS[op](lt, rt)
+    return vals[rows[prog.ids[output_nm]]]
+
+
+def _evaluate_uncaused(prog: Program, caused: np.ndarray) -> list[int]:
+    """`evaluate` of the monkeys that do not depend on the input, 0 for the
+    ones that do.
+    """
+    vals = [val or 0 for val in prog.consts]
+    ops, lts, rts = prog.opcodes.tolist(), prog.lts.tolist(), prog.rts.tolist()
+    for ix, (op, cs) in enumerate(zip(ops, caused.tolist())):
+        if cs:
+            vals[ix] = 0
+        elif op != LEAF:
+            vals[ix] = PY_OPS[op](vals[lts[ix]], vals[rts[ix]])
+    return vals
+
+
+def _operand_vals(ids, caused, rows, vals, base) -> np.ndarray:
+    """Rows of the operands, the number of the operands that do not depend
+    on the input is repeated along the row.
+    """
+    out = np.empty((len(ids), vals.shape[1]), dtype=vals.dtype)
+    is_caused = caused[ids]
+    out[is_caused] = vals[rows[ids[is_caused]]]
+    out[~is_caused] = base[ids[~is_caused], None]
+    return out
+
+
+def solve_linear(
+    prog: Program,
+    input_nm: str = "humn",
+    output_nm: str = "root",
+    target: Optional[int] = None,
+) -> int:
+    """Number `input_nm` has to yell for `output_nm` to yell `target`, or
+    with no target, for both operands of `output_nm` to be equal.
+
+    Monkeys that do not depend on the input are evaluated like `do_op`. The
+    ones that do are the exact linear form (a, b) of `a*input + b` with
+    Fractions, so the input is solved for in O(1) once the output is reached.
+    Raises NonLinearError if the input is multiplied by itself or divides,
+    or if a division on the way rounds so the answer does not solve it.
+    """
+    vals = list(prog.consts)
+    in_ix, out_ix = prog.ids[input_nm], prog.ids[output_nm]
+    vals[in_ix] = (Fraction(1), Fraction(0))
+    equal_operands = target is None
+    ops, lts, rts = prog.opcodes.tolist(), prog.lts.tolist(), prog.rts.tolist()
+    for ix, op in enumerate(ops):
+        # the input may be any monkey, its number is the unknown
+        if op == LEAF or ix == in_ix:
+            continue
+        lt, rt = vals[lts[ix]], vals[rts[ix]]
+        if ix == out_ix and target is None:
+            # both operands equal, same as output = lt - rt = 0
+            op, target = OPS.index("-"), 0
+        if type(lt) is tuple or type(rt) is tuple:
+            vals[ix] = _linear_op(lt=lt, rt=rt, op=op, name=prog.names[ix])
+        else:
+            vals[ix] = PY_OPS[op](lt, rt)
+        if ix == out_ix:
+            break
+    out = vals[out_ix]
+    if type(out) is not tuple:
+        raise ValueError(f"{output_nm} does not depend on {input_nm}")
+    slope, intercept = out
+    if slope == 0:
+        raise ValueError(
+            f"{output_nm} does not depend on {input_nm} once the terms cancel, "
+            "there is no unique solution"
+        )
+    val = (target - intercept) / slope
+    if val.denominator != 1:
+        raise NonLinearError(
+            f"{input_nm} = {val} is not an integer, the divisions on the way to "
+            f"{output_nm} would round it"
+        )
+    _check_solution(
+        prog=prog,
+        input_nm=input_nm,
+        output_nm=output_nm,
+        target=None if equal_operands else target,
+        val=int(val),
+    )
+    return int(val)
+
+
+def _check_solution(prog, input_nm, output_nm, target, val) -> None:
+    """The linear forms divide exactly, so a division on the way that rounds
+    gives a wrong answer. Evaluating the program at it catches those.
+    """
+    try:
+        vals = evaluate(prog=prog, values={input_nm: val})
+    except ZeroDivisionError as err:
+        raise NonLinearError(f"{input_nm} = {val} divides by zero") from err
+    if target is None:
+        out_ix = prog.ids[output_nm]
+        lt, rt = (prog.names[ix] for ix in (prog.lts[out_ix], prog.rts[out_ix]))
+        is_solved = vals[lt] == vals[rt]
+    else:
+        is_solved = vals[output_nm] == target
+    if not is_solved:
+        raise NonLinearError(
+            f"{input_nm} = {val} does not solve {output_nm}, the divisions on the "
+            "way to it round"
+        )
+
+
+def _linear_op(lt, rt, op, name):
+    """`op` of two linear forms (a, b), or ints for the constant operand."""
+    (la, lb), (ra, rb) = (
+        val if type(val) is tuple else (Fraction(0), Fraction(val)) for val in (lt, rt)
+    )
+    if OPS[op] == "+":
+        return (la + ra, lb + rb)
+    elif OPS[op] == "-":
+        return (la - ra, lb - rb)
+    elif OPS[op] == "*":
+        if la and ra:
+            raise NonLinearError(f"{name} multiplies two operands with the input")
+        return (la * rb + ra * lb, lb * rb)
+    else:
+        if ra:
+            raise NonLinearError(f"{name} divides by an operand with the input")
+        return (la / rb, lb / rb)
@@ -0,0 +1,504 @@
+"""Advent of code 2022 day 23 solution
+
+https://adventofcode.com/2022/day/23
+
+The set based simulation is promoted from `day23.ipynb`, `play_dense` runs
+the same rules on a padded boolean grid with array shifts and `play_sparse`
+on a sorted array of packed elf coordinates, for elves spread over an area
+too large for a grid. `play_incremental` only re-checks the elves that have a
+neighbour, so the rounds get cheaper as the elves settle.
+
+Usage::
+
+    # Empty tiles after 10 rounds
+    python -m day23.day23 --file day23/input.txt --max-rounds 10
+
+    # Run until no elf moves
+    python -m day23.day23 --file day23/input.txt --engine dense
+
+    # Huge, spread-out elf populations
+    python -m day23.day23 --file day23/input.txt --engine sparse
+
+    # Incremental, logs the active elves per round at debug level
+    python -m day23.day23 --file day23/input.txt --engine incremental
+
+    # Checkpoint every 100 rounds, then pick up where an interrupted run stopped
+    python -m day23.day23 --file day23/input.txt --checkpoint-every 100
+    python -m day23.day23 --file day23/input.txt --resume
+"""
+import collections as c
+import itertools as it
+import os
+import time
+import util
+
+from copy import deepcopy
+
+import numpy as np
+
+
+MV_ORDERS = [
+    ["n", "s", "w", "e"],
+    ["s", "w", "e", "n"],
+    ["w", "e", "n", "s"],
+    ["e", "n", "s", "w"],
+]
+MAX_ROUNDS = 1000_000_000_000
+# Elves (i, j) are packed into the int64 i * STRIDE + j for the sparse engine
+STRIDE = 1 << 32
+# (di, dj) of the 8 neighbours and of the move in each direction
+ADJ_OFFSETS = {
+    "nw": (-1, -1),
+    "n": (-1, 0),
+    "ne": (-1, 1),
+    "w": (0, -1),
+    "e": (0, 1),
+    "sw": (1, -1),
+    "s": (1, 0),
+    "se": (1, 1),
+}
+# (di, dj) of the 3x3 block around a cell, itself included
+NEIGHBOURS = list(it.product([-1, 0, 1], [-1, 0, 1]))
+CHECKPOINT_EVERY = 100
+
+
+def main():
+    opts = util.parse_args(
+        args={
+            "--max-rounds": dict(
+                help="Stop after these many rounds.", type=int, default=MAX_ROUNDS
+            ),
+            "--engine": dict(
+                choices=["set", "dense", "sparse", "incremental"], default="dense"
+            ),
+            "--checkpoint-every": dict(
+                help=(
+                    "Save the elves to <file>.checkpoint.npz every these many "
+                    f"rounds, {CHECKPOINT_EVERY} with --resume."
+                ),
+                type=int,
+            ),
+            "--resume": dict(
+                help="Resume from the checkpoint of an earlier run if there is one.",
+                action="store_true",
+            ),
+        }
+    )
+    _, elves = parse_fl(opts.file)
+    kwargs = {"active_counts": []} if opts.engine == "incremental" else {}
+    every = opts.checkpoint_every or (CHECKPOINT_EVERY if opts.resume else None)
+    if every:
+        kwargs["checkpoint"] = Checkpoint(
+            path=f"{opts.file}.checkpoint.npz", every=every
+        )
+    if opts.resume and os.path.exists(kwargs["checkpoint"].path):
+        kwargs["start_round"], elves = kwargs["checkpoint"].load()
+        util.log.info(f"Resuming from round {kwargs['start_round']}")
+    play_fn = {
+        "set": play,
+        "dense": play_dense,
+        "sparse": play_sparse,
+        "incremental": play_incremental,
+    }[opts.engine]
+    st = time.time()
+    rounds, empty = play_fn(elves=elves, max_rounds=opts.max_rounds, **kwargs)
+    util.log.info(f"Rounds: {rounds} | Empty tiles: {empty}")
+    first_round = kwargs.get("start_round", 0) + 1
+    for rnd, cnt in enumerate(kwargs.get("active_counts", []), start=first_round):
+        util.log.debug(f"Round: {rnd} | Active elves: {cnt:,}/{len(elves):,}")
+    util.log.info(f"Elapsed: {time.time() - st:.2f}s")
+
+
+def parse_fl(fl):
+    """The memory-mapped uint8 grid of the file and the set of elves."""
+    grid = util.load_grid(fl)
+    return grid, set(map(tuple, np.argwhere(util.grid_mask(grid, "#")).tolist()))
+
+
+def next_pos(pos, elves, mv_order):
+    if not is_other_elf_adj(pos=pos, elves=elves):
+        return pos
+    return _propose(pos=pos, elves=elves, mv_order=mv_order)
+
+
+def _propose(pos, elves, mv_order):
+    """Position proposed by an elf that has a neighbour."""
+    mv_map = {
+        "n": {"adj_fn": _adj_north, "pi": -1, "pj": 0},
+        "s": {"adj_fn": _adj_south, "pi": +1, "pj": 0},
+        "e": {"adj_fn": _adj_east, "pi": 0, "pj": +1},
+        "w": {"adj_fn": _adj_west, "pi": 0, "pj": -1},
+    }
+    for mv in mv_order:
+        mv_info = mv_map[mv]
+        if mv_info["adj_fn"](pos) & elves:
+            continue
+        else:
+            next_pos = (pos[0] + mv_info["pi"], pos[1] + mv_info["pj"])
+            break
+    else:
+        next_pos = pos
+    return next_pos
+
+
+def _adj_north(pos):
+    pi, pj = pos
+    return {(pi - 1, pj - 1), (pi - 1, pj), (pi - 1, pj + 1)}
+
+
+def _adj_south(pos):
+    pi, pj = pos
+    return {(pi + 1, pj - 1), (pi + 1, pj), (pi + 1, pj + 1)}
+
+
+def _adj_east(pos):
+    pi, pj = pos
+    return {(pi - 1, pj + 1), (pi, pj + 1), (pi + 1, pj + 1)}
+
+
+def _adj_west(pos):
+    pi, pj = pos
+    return {(pi - 1, pj - 1), (pi, pj - 1), (pi + 1, pj - 1)}
+
+
+def is_other_elf_adj(pos, elves):
+    return any(adj in elves for adj in _adj_poses(pos))
+
+
+def _adj_poses(pos):
+    return {
+        (pos[0] + i, pos[1] + j)
+        for i, j in it.product([-1, 0, 1], [-1, 0, 1])
+        if not i == j == 0
+    }
+
+
+def play(
+    elves,
+    max_rounds=MAX_ROUNDS,
+    mv_orders_gvn=MV_ORDERS,
+    start_round=0,
+    checkpoint=None,
+):
+    """Returns the number of rounds played and the empty tiles at the end.
+
+    All the engines take the same `start_round`, to carry on from a
+    checkpoint, and `checkpoint`, a `Checkpoint` saved every few rounds.
+    """
+    elves = deepcopy(elves)
+    rounds = start_round
+    for _round in range(start_round, max_rounds):
+        rounds = _round + 1
+        is_finished, new_pos_map, pos_ctr = round1(
+            elves=elves, mv_order=mv_orders_gvn[_round % len(mv_orders_gvn)]
+        )
+        if is_finished:
+            break
+        elves = round2(new_pos_map=new_pos_map, pos_ctr=pos_ctr)
+        if checkpoint is not None and checkpoint.is_due(rounds):
+            checkpoint.save(rounds=rounds, elves=np.array(list(elves)))
+    return rounds, num_empty_grid(elves)
+
+
+def round1(elves, mv_order):
+    is_finished, new_pos_map, pos_ctr = True, {}, c.Counter()
+    for old_pos in elves:
+        np = next_pos(pos=old_pos, elves=elves, mv_order=mv_order)
+        is_finished &= old_pos == np
+        new_pos_map[old_pos] = np
+        pos_ctr[np] += 1
+    return is_finished, new_pos_map, pos_ctr
+
+
+def round2(new_pos_map, pos_ctr):
+    return {
+        new_pos if pos_ctr[new_pos] == 1 else old_pos
+        for old_pos, new_pos in new_pos_map.items()
+    }
+
+
+def num_empty_grid(elves):
+    pis, pjs = list(zip(*sorted(elves)))
+    return ((max(pis) - min(pis) + 1) * (max(pjs) - min(pjs) + 1)) - len(elves)
+
+
+def play_incremental(
+    elves,
+    max_rounds=MAX_ROUNDS,
+    mv_orders_gvn=MV_ORDERS,
+    start_round=0,
+    checkpoint=None,
+    active_counts=None,
+):
+    """Same rules and result as `play`, but each round only looks at the
+    active elves, the ones with a neighbour. Elves without one do not move
+    and stay that way until an elf moves next to them, so after every round
+    only the active elves and the cells around the moved elves need to be
+    re-checked.
+
+    The number of active elves in every round is appended to `active_counts`.
+    The active set is not checkpointed, a resumed run re-checks every elf once.
+    """
+    elves = set(elves)
+    candidates = set(elves)
+    rounds = start_round
+    for _round in range(start_round, max_rounds):
+        rounds = _round + 1
+        mv_order = mv_orders_gvn[_round % len(mv_orders_gvn)]
+        active, new_pos_map = [], {}
+        for old_pos in candidates:
+            if old_pos not in elves:
+                continue
+            new_pos = _propose_adj(pos=old_pos, elves=elves, mv_order=mv_order)
+            if new_pos is None:
+                continue
+            active.append(old_pos)
+            if new_pos != old_pos:
+                new_pos_map[old_pos] = new_pos
+        if active_counts is not None:
+            active_counts.append(len(active))
+        if not new_pos_map:
+            break
+        pos_ctr = c.Counter(new_pos_map.values())
+        moved = [(old, new) for old, new in new_pos_map.items() if pos_ctr[new] == 1]
+        # Elves only move into cells that were empty at the start of the round
+        elves.difference_update(old for old, _ in moved)
+        elves.update(new for _, new in moved)
+        candidates = set(active)
+        for (oi, oj), (ni, nj) in moved:
+            # the moved elf and every elf that gained or lost a neighbour
+            candidates.update((oi + di, oj + dj) for di, dj in NEIGHBOURS)
+            candidates.update((ni + di, nj + dj) for di, dj in NEIGHBOURS)
+        if checkpoint is not None and checkpoint.is_due(rounds):
+            checkpoint.save(rounds=rounds, elves=np.array(list(elves)))
+    return rounds, num_empty_grid(elves)
+
+
+def _propose_adj(pos, elves, mv_order):
+    """`next_pos` with one lookup per neighbour, shared by the neighbour check
+    and the four directions. None for an elf without a neighbour.
+    """
+    pi, pj = pos
+    nw, n, ne = (
+        (pi - 1, pj - 1) in elves,
+        (pi - 1, pj) in elves,
+        (pi - 1, pj + 1) in elves,
+    )
+    w, e = (pi, pj - 1) in elves, (pi, pj + 1) in elves
+    sw, s, se = (
+        (pi + 1, pj - 1) in elves,
+        (pi + 1, pj) in elves,
+        (pi + 1, pj + 1) in elves,
+    )
+    if not (nw or n or ne or w or e or sw or s or se):
+        return None
+    for mv in mv_order:
+        if mv == "n":
+            if not (nw or n or ne):
+                return (pi - 1, pj)
+        elif mv == "s":
+            if not (sw or s or se):
+                return (pi + 1, pj)
+        elif mv == "w":
+            if not (nw or w or sw):
+                return (pi, pj - 1)
+        elif not (ne or e or se):
+            return (pi, pj + 1)
+    return pos
+
+
+def play_dense(
+    elves,
+    max_rounds=MAX_ROUNDS,
+    mv_orders_gvn=MV_ORDERS,
+    start_round=0,
+    checkpoint=None,
+):
+    """Same rules and result as `play` on a padded boolean grid.
+
+    Neighbours, the four direction masks and the conflicting proposals of a
+    round are computed for every elf at once with array shifts. The grid is
+    grown whenever an elf reaches its border.
+    """
+    grid = _to_grid(elves)
+    rounds = start_round
+    for _round in range(start_round, max_rounds):
+        rounds = _round + 1
+        grid = _ensure_margin(grid)
+        grid, is_finished = _dense_round(
+            grid=grid, mv_order=mv_orders_gvn[_round % len(mv_orders_gvn)]
+        )
+        if is_finished:
+            break
+        if checkpoint is not None and checkpoint.is_due(rounds):
+            checkpoint.save(rounds=rounds, elves=np.argwhere(grid))
+    return rounds, num_empty_dense(grid)
+
+
+def _to_grid(elves):
+    pis, pjs = (np.array(p) for p in zip(*elves))
+    grid = np.zeros((pis.max() - pis.min() + 1, pjs.max() - pjs.min() + 1), bool)
+    grid[pis - pis.min(), pjs - pjs.min()] = True
+    return grid
+
+
+def _ensure_margin(grid):
+    """Keeps an empty border of one cell around the elves, growing the grid
+    by half its size when an elf reaches the border.
+    """
+    if grid[0].any() or grid[-1].any() or grid[:, 0].any() or grid[:, -1].any():
+        return np.pad(grid, max(grid.shape) // 2 + 1)
+    return grid
+
+
+def _dense_round(grid, mv_order):
+    # Views of the 8 neighbours of every cell inside the border
+    nw, n, ne = grid[:-2, :-2], grid[:-2, 1:-1], grid[:-2, 2:]
+    w, e = grid[1:-1, :-2], grid[1:-1, 2:]
+    sw, s, se = grid[2:, :-2], grid[2:, 1:-1], grid[2:, 2:]
+    free = {
+        "n": ~(nw | n | ne),
+        "s": ~(sw | s | se),
+        "w": ~(nw | w | sw),
+        "e": ~(ne | e | se),
+    }
+    undecided = grid[1:-1, 1:-1] & (nw | n | ne | w | e | sw | s | se)
+    proposals = {}
+    for mv in mv_order:
+        proposals[mv] = undecided & free[mv]
+        undecided &= ~proposals[mv]
+    if not any(p.any() for p in proposals.values()):
+        return grid, True
+    # Destination of each proposal in the coordinates of the full grid
+    targets = {
+        "n": (slice(None, -2), slice(1, -1)),
+        "s": (slice(2, None), slice(1, -1)),
+        "w": (slice(1, -1), slice(None, -2)),
+        "e": (slice(1, -1), slice(2, None)),
+    }
+    counts = np.zeros(grid.shape, np.uint8)
+    for mv, prop in proposals.items():
+        counts[targets[mv]] += prop
+    new_grid = grid.copy()
+    for mv, prop in proposals.items():
+        moved = prop & (counts[targets[mv]] == 1)
+        new_grid[1:-1, 1:-1] &= ~moved
+        new_grid[targets[mv]] |= moved
+    return new_grid, False
+
+
+def num_empty_dense(grid):
+    rows, cols = np.flatnonzero(grid.any(axis=1)), np.flatnonzero(grid.any(axis=0))
+    area = (rows[-1] - rows[0] + 1) * (cols[-1] - cols[0] + 1)
+    return int(area - grid.sum())
+
+
+def play_sparse(
+    elves,
+    max_rounds=MAX_ROUNDS,
+    mv_orders_gvn=MV_ORDERS,
+    start_round=0,
+    checkpoint=None,
+):
+    """Same rules and result as `play` with the elves packed into one sorted
+    int64 array. Neighbours are looked up with a binary search and conflicting
+    proposals are found with `np.unique` counts, so memory only depends on the
+    number of elves and not on the area they cover.
+    """
+    keys = np.sort(_pack(*(np.array(p, dtype=np.int64) for p in zip(*elves))))
+    rounds = start_round
+    for _round in range(start_round, max_rounds):
+        rounds = _round + 1
+        keys, is_finished = _sparse_round(
+            keys=keys, mv_order=mv_orders_gvn[_round % len(mv_orders_gvn)]
+        )
+        if is_finished:
+            break
+        if checkpoint is not None and checkpoint.is_due(rounds):
+            checkpoint.save(rounds=rounds, elves=np.column_stack(_unpack(keys)))
+    pis, pjs = _unpack(keys)
+    area = (pis.max() - pis.min() + 1) * (pjs.max() - pjs.min() + 1)
+    return rounds, int(area - len(keys))
+
+
+def _pack(pis, pjs):
+    return pis * STRIDE + pjs
+
+
+def _unpack(keys):
+    pjs = (keys + STRIDE // 2) % STRIDE - STRIDE // 2
+    return (keys - pjs) // STRIDE, pjs
+
+
+def _sparse_round(keys, mv_order):
+    adj = {
+        nm: _contains(sorted_keys=keys, queries=keys + _pack(di, dj))
+        for nm, (di, dj) in ADJ_OFFSETS.items()
+    }
+    free = {
+        "n": ~(adj["nw"] | adj["n"] | adj["ne"]),
+        "s": ~(adj["sw"] | adj["s"] | adj["se"]),
+        "w": ~(adj["nw"] | adj["w"] | adj["sw"]),
+        "e": ~(adj["ne"] | adj["e"] | adj["se"]),
+    }
+    undecided = np.logical_or.reduce(list(adj.values()))
+    targets, proposed = keys.copy(), np.zeros(len(keys), bool)
+    for mv in mv_order:
+        prop = undecided & free[mv]
+        targets[prop] += _pack(*ADJ_OFFSETS[mv])
+        proposed |= prop
+        undecided &= ~prop
+    if not proposed.any():
+        return keys, True
+    _, inverse, counts = np.unique(targets, return_inverse=True, return_counts=True)
+    new_keys = np.where(proposed & (counts[inverse] == 1), targets, keys)
+    return np.sort(new_keys), False
+
+
+def _contains(sorted_keys, queries):
+    ixs = np.searchsorted(sorted_keys, queries).clip(max=len(sorted_keys) - 1)
+    return sorted_keys[ixs] == queries
+
+
+class Checkpoint:
+    """Elf positions, rounds played and move-order phase saved as `.npz`.
+
+    The file is written next to the old one and renamed over it, so a run
+    killed in the middle of a save still leaves the previous checkpoint.
+    """
+
+    def __init__(self, path, every=CHECKPOINT_EVERY, mv_orders=MV_ORDERS):
+        self.path = path
+        self.every = every
+        self.mv_orders = mv_orders
+
+    def is_due(self, rounds):
+        return rounds % self.every == 0
+
+    def save(self, rounds, elves):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                elves=np.asarray(elves, dtype=np.int64),
+                rounds=rounds,
+                phase=rounds % len(self.mv_orders),
+            )
+        os.replace(tmp_path, self.path)
+        util.log.debug(f"Saved checkpoint at round {rounds} to {self.path}")
+
+    def load(self):
+        """Returns the rounds played and the set of elves."""
+        with np.load(self.path) as ckpt:
+            rounds, phase = int(ckpt["rounds"]), int(ckpt["phase"])
+            elves = {(int(pi), int(pj)) for pi, pj in ckpt["elves"]}
+        if phase != rounds % len(self.mv_orders):
+            raise ValueError(
+                f"Checkpoint {self.path} is at round {rounds} but move-order "
+                f"phase {phase}, it was saved with different move orders."
+            )
+        return rounds, elves
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""Blizzard occupancy of the day24 valley shared by day24.py and day24-v2.py
+
+The occupancy of every minute in the blizzard period can optionally be cached
+next to the input file as a `.npy` file, keyed by a hash of the input, so that
+later runs memory-map it instead of re-simulating the blizzards.
+"""
+import hashlib
+import math
+import os
+import time
+
+import numpy as np
+
+
+def load_world(fl, world_at_t0, cache=False):
+    """Builds the World of the valley parsed from `fl`. With `cache=True` the
+    occupancy is read from (or written to) the on-disk cache.
+    """
+    if not cache:
+        return World(world_at_t0)
+    period = _period(world_at_t0)
+    cache_fl = _cache_path(fl)
+    st = time.time()
+    if os.path.exists(cache_fl):
+        occupied = np.load(cache_fl, mmap_mode="r")
+        start = "Warm start: mapped"
+    else:
+        occupied = _build_occupancy(world=world_at_t0, period=period)
+        # a run killed mid-save must not leave a truncated cache behind
+        tmp_fl = f"{cache_fl}.tmp"
+        with open(tmp_fl, "wb") as f:
+            np.save(f, occupied)
+        os.replace(tmp_fl, cache_fl)
+        start = "Cold start: built and cached"
+    elp = time.time() - st
+    print(f"{start} blizzard occupancy {cache_fl} in {elp * 1000:,.1f}ms")
+    return World(world_at_t0, occupied=occupied)
+
+
+def _cache_path(fl, block_size=1 << 20):
+    sha = hashlib.sha1()
+    with open(fl, "rb") as f:
+        while block := f.read(block_size):
+            sha.update(block)
+    return f"{fl}.{sha.hexdigest()[:16]}.occupancy.npy"
+
+
+def load_grid(fl):
+    """Memory-maps the valley as a read-only uint8 array of shape (vlen, hlen),
+    a view of the file's (vlen, hlen + 1) bytes without the newline column,
+    or (vlen, hlen + 2) bytes without the two CRLF columns.
+
+    Same as `util.load_grid`, which the day24 scripts cannot import as they
+    run from their own directory.
+    """
+    flat = np.memmap(fl, dtype=np.uint8, mode="r")
+    newline = _first_newline(flat=flat)
+    # a "\r" before the newline is part of a CRLF line ending, not a cell
+    eol = 1 + int(0 < newline < len(flat) and flat[newline - 1] == ord("\r"))
+    hlen, stride = newline + 1 - eol, newline + 1
+    # the last line may or may not end with a line ending
+    vlen = (len(flat) + eol) // stride
+    is_rect = (
+        hlen > 0
+        and vlen * stride - len(flat) in (0, eol)
+        and (flat[newline::stride] == ord("\n")).all()
+        and ((flat[hlen::stride] == ord("\r")).all() or eol == 1)
+        and (vlen * stride == len(flat) or flat[-1] not in b"\r\n")
+    )
+    if not is_rect:
+        raise ValueError(f"{fl} is not a rectangular valley")
+    return np.lib.stride_tricks.as_strided(
+        flat, shape=(vlen, hlen), strides=(stride, 1), writeable=False
+    )
+
+
+def _first_newline(flat, chunk_size=1 << 16):
+    """Index of the first newline in `flat`, or its length if it has none,
+    scanned a chunk at a time like `util._first_newline`.
+    """
+    for start in range(0, len(flat), chunk_size):
+        newlines = np.flatnonzero(flat[start : start + chunk_size] == ord("\n"))
+        if len(newlines):
+            return start + int(newlines[0])
+    return len(flat)
+
+
+def grid_cells(grid, char):
+    """Set of the (i, j) cells of `grid` holding `char`."""
+    return set(map(tuple, np.argwhere(grid == ord(char)).tolist()))
+
+
+def _period(world):
+    return math.lcm(world["hlen"] - 2, world["vlen"] - 2)
+
+
+class World:
+    """Blizzards repeat every lcm(inner width, inner height) minutes, so the
+    occupancy of every phase in the period is precomputed once into a uint8
+    array of shape (period, vlen, hlen) where 1 is a wall or a blizzard. Any
+    minute can then be queried in O(1), in any order.
+    """
+
+    def __init__(self, world_at_t0, occupied=None):
+        self.world = world_at_t0
+        self.period = _period(world_at_t0)
+        if occupied is None:
+            occupied = _build_occupancy(world=world_at_t0, period=self.period)
+        self.occupied = occupied
+
+    def is_free(self, t, i, j):
+        return (
+            0 <= i < self.world["vlen"]
+            and 0 <= j < self.world["hlen"]
+            and not self.occupied[t % self.period, i, j]
+        )
+
+    def at_time(self, t):
+        """Brings the world at any time t as a dict of blizzard sets, used to
+        display the grid.
+        """
+        world = self.world
+        hlen, vlen = world["hlen"], world["vlen"]
+        return {
+            **world,
+            "time": t,
+            "leftw": {_move_lt(pi, pj, hlen, t) for pi, pj in world["leftw"]},
+            "rightw": {_move_rt(pi, pj, hlen, t) for pi, pj in world["rightw"]},
+            "upw": {_move_up(pi, pj, vlen, t) for pi, pj in world["upw"]},
+            "downw": {_move_down(pi, pj, vlen, t) for pi, pj in world["downw"]},
+        }
+
+
+def _build_occupancy(world, period):
+    hlen, vlen = world["hlen"], world["vlen"]
+    occupied = np.zeros((period, vlen, hlen), dtype=np.uint8)
+    wall_i, wall_j = _coords(world["wall"])
+    occupied[:, wall_i, wall_j] = 1
+    ts = np.arange(period)[:, None]
+    for blz, move_fn in [
+        ("leftw", _move_lt),
+        ("rightw", _move_rt),
+        ("upw", _move_up),
+        ("downw", _move_down),
+    ]:
+        pi, pj = _coords(world[blz])
+        dim = hlen if blz in {"leftw", "rightw"} else vlen
+        ni, nj = np.broadcast_arrays(*move_fn(pi, pj, dim, ts))
+        occupied[np.broadcast_to(ts, ni.shape), ni, nj] = 1
+    return occupied
+
+
+def _coords(cells):
+    pis, pjs = zip(*cells) if cells else ((), ())
+    return np.array(pis, dtype=int), np.array(pjs, dtype=int)
+
+
+# The moves below work on ints as well as on numpy arrays of positions/times.
+def _move_lt(pi, pj, hlen, t):
+    # -2 because the first and last cols are walls
+    return (pi, 1 + (pj - 1 - t) % (hlen - 2))
+
+
+def _move_rt(pi, pj, hlen, t):
+    return (pi, 1 + (pj - 1 + t) % (hlen - 2))
+
+
+def _move_up(pi, pj, vlen, t):
+    return (1 + (pi - 1 - t) % (vlen - 2), pj)
+
+
+def _move_down(pi, pj, vlen, t):
+    return (1 + (pi - 1 + t) % (vlen - 2), pj)
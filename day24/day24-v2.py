@@ -10,32 +10,29 @@ import functools as ft
 import numpy as np
 import tqdm.notebook
 import heapq
+import argparse
+import os
+
+import blizzard
 
 
 GRID_MP = {"#": "wall", ">": "rightw", "<": "leftw", "^": "upw", "v": "downw"}
 INV_GRID_MP = {v: k for k, v in GRID_MP.items()}
 BLIZZARD = {"rightw", "leftw", "upw", "downw"}
+CHECKPOINT_EVERY = 100
 
 
 def parse_fl(fl, grid_mp=GRID_MP):
-    lns = open(fl).read().splitlines()
-    hlen, vlen = len(lns[0]), len(lns)
+    grid = blizzard.load_grid(fl)
+    vlen, hlen = grid.shape
     world = {
         "time": 0,
         "goal": (vlen - 1, hlen - 2),
-        "wall": set(),
-        "leftw": set(),
-        "rightw": set(),
-        "upw": set(),
-        "downw": set(),
         "hlen": hlen,
         "vlen": vlen,
     }
-    for i, ln in enumerate(lns):
-        for j, c in enumerate(ln):
-            if c not in grid_mp:
-                continue
-            world[grid_mp[c]].add((i, j))
+    for c, cell_type in grid_mp.items():
+        world[cell_type] = blizzard.grid_cells(grid=grid, char=c)
     return (0, 1), world
 
 
@@ -71,60 +68,6 @@ def _char(i, j, world, player, inv_grid_mp) -> str:
     return str(ch_char)
 
 
-class World:
-    def __init__(self, world_at_t0):
-        self.cache = {0: world_at_t0}
-        self.max_t = 0
-
-    def at_time(self, t):
-        """Brings new world, also caches world world as
-        only thing that changes is player position.
-        """
-        if t in self.cache:
-            new_world = self.cache[t]
-        else:
-            assert t == self.max_t + 1, "We move build world 1 second at a time"
-            self.max_t = t
-            world = self.cache[t - 1]
-            hlen, vlen = world["hlen"], world["vlen"]
-            hend, vend = hlen - 1, vlen - 1
-            new_world = {
-                "time": world["time"] + 1,
-                "goal": world["goal"],
-                # never changes no need to create copy
-                "wall": world["wall"],
-                "leftw": {_move_lt(pi, pj, hlen) for pi, pj in world["leftw"]},
-                "rightw": set(_move_rt(pi, pj, hlen) for pi, pj in world["rightw"]),
-                "upw": set(_move_up(pi, pj, vlen) for pi, pj in world["upw"]),
-                "downw": set(_move_down(pi, pj, vlen) for pi, pj in world["downw"]),
-                "hlen": hlen,
-                "vlen": vlen,
-            }
-            self.cache[t] = new_world
-        return new_world
-
-
-def _move_lt(pi, pj, hlen):
-    # -1 because last col is a wall
-    pj = pj - 1 if pj > 1 else hlen - 2
-    return (pi, pj)
-
-
-def _move_rt(pi, pj, hlen):
-    pj = pj + 1 if pj < hlen - 2 else 1
-    return (pi, pj)
-
-
-def _move_up(pi, pj, vlen):
-    pi = pi - 1 if pi > 1 else vlen - 2
-    return (pi, pj)
-
-
-def _move_down(pi, pj, vlen):
-    pi = pi + 1 if pi < vlen - 2 else 1
-    return (pi, pj)
-
-
 @dataclass
 class ScoreState:
     hscore: int
@@ -149,16 +92,61 @@ def timed_fn(f):
 
 
 @timed_fn
-def search_wrapper(player, goal, st_world, disp_simple=True, one_trip=True):
-    worlder = World(st_world)
-    kwrgs = dict(worlder=worlder, disp_simple=disp_simple)
-    if one_trip:
-        trip_times = [search_path(player=player, goal=goal, cur_time=0, **kwrgs)]
+def search_wrapper(
+    player,
+    goal,
+    st_world,
+    disp_simple=True,
+    one_trip=True,
+    engine="heapq",
+    worlder=None,
+    checkpoint=None,
+    resume=False,
+):
+    """Search for the trip(s) between player and goal.
+
+    engine="heapq" runs the A* search over (time, position) states and
+    engine="frontier" runs the bitmask breadth first search. A prebuilt
+    (possibly cached) `blizzard.World` can be passed in as `worlder`.
+
+    The frontier search saves a `Checkpoint` every few minutes when one is
+    passed in, and with `resume=True` carries on from the one on disk.
+    """
+    if checkpoint is not None and engine != "frontier":
+        raise ValueError("Only the frontier engine can be checkpointed")
+    if engine == "frontier":
+        search_fn = ft.partial(
+            search_frontier, valley=bitmask_valley(st_world), checkpoint=checkpoint
+        )
+    elif engine == "heapq":
+        search_fn = ft.partial(
+            search_path,
+            worlder=worlder or blizzard.World(st_world),
+            disp_simple=disp_simple,
+        )
     else:
-        t1_tm = search_path(player=player, goal=goal, cur_time=0, **kwrgs)
-        t2_tm = search_path(player=goal, goal=player, cur_time=t1_tm, **kwrgs)
-        t3_tm = search_path(player=player, goal=goal, cur_time=t2_tm, **kwrgs)
-        trip_times = [t1_tm, t2_tm, t3_tm]
+        raise ValueError(f"Unknown search engine {engine}")
+    legs = [(player, goal)]
+    if not one_trip:
+        legs += [(goal, player), (player, goal)]
+    trip_times, start = [], None
+    if resume and checkpoint is not None and os.path.exists(checkpoint.path):
+        trip_times, start = checkpoint.load()
+        print(f"Resuming from {checkpoint.path} at trip {len(trip_times) + 1}")
+    for src, dst in legs[len(trip_times) :]:
+        if checkpoint is not None:
+            checkpoint.trip_times = trip_times
+        trip_times.append(
+            search_fn(
+                player=src,
+                goal=dst,
+                cur_time=trip_times[-1] if trip_times else 0,
+                **({"start": start} if start else {}),
+            )
+        )
+        start = None
+        if checkpoint is not None:
+            checkpoint.save(cur_time=trip_times[-1])
     for tnum, tm in enumerate(trip_times, start=1):
         print(f"Trip {tnum} | Time taken: {tm} | Total time: {sum(trip_times)}")
     return trip_times
@@ -176,8 +164,9 @@ def search_path(player, goal, worlder, cur_time, disp_simple):
         seen.add((ct, plyr))
         if plyr == goal:
             return ct
-        new_world = worlder.at_time(ct + 1)
-        for ss in _next_valid_states(new_world=new_world, player=plyr, goal=goal):
+        for ss in _next_valid_states(
+            worlder=worlder, player=plyr, goal=goal, new_time=ct + 1
+        ):
             if (ss.cur_time, ss.player) in seen:
                 # If i have come back to the same state as before after several
                 # steps, there is no point continuing the same options again
@@ -194,32 +183,20 @@ def search_path(player, goal, worlder, cur_time, disp_simple):
         )
 
 
-def _next_valid_states(new_world, player, goal):
+def _next_valid_states(worlder, player, goal, new_time):
     """Provides next states but uses A* to select which
     states are searched first.
     """
+    pi, pj = player
+    heuristic_score = _manhattan_dist(player, goal=goal) + new_time
     for adj_i, adj_j in it.product([-1, 0, 1], [-1, 0, 1]):
         if adj_i != 0 and adj_j != 0:
             # diag paths not allowed
             continue
-        pi, pj = player
         npi, npj = pi + adj_i, pj + adj_j
-        new_pos = (npi, npj)
-        if (
-            (npi < 0)
-            or (npj < 0)
-            or (npi >= new_world["vlen"])
-            or (npj > new_world["hlen"])
-            or any(
-                new_pos in new_world[obs]
-                for obs in ["wall", "leftw", "rightw", "upw", "downw"]
-            )
-        ):
+        if not worlder.is_free(new_time, npi, npj):
             continue
-        heuristic_score = _manhattan_dist(player, goal=goal) + new_world["time"]
-        yield ScoreState(
-            hscore=heuristic_score, player=new_pos, cur_time=new_world["time"]
-        )
+        yield ScoreState(hscore=heuristic_score, player=(npi, npj), cur_time=new_time)
 
 
 def _manhattan_dist(player, goal):
@@ -227,6 +204,167 @@ def _manhattan_dist(player, goal):
     return abs(pi - gi) + abs(pj - gj)
 
 
+def bitmask_valley(world):
+    """Encodes the inner valley (without the walls) as one integer bitmask per
+    row for every blizzard direction. Bit `k` of a row is column `k+1`.
+
+    Blizzards only wrap around their own row or column, so the blizzards at any
+    minute are rotations of the masks at time 0.
+    """
+    width, height = world["hlen"] - 2, world["vlen"] - 2
+    valley = {
+        "width": width,
+        "height": height,
+        "full": (1 << width) - 1,
+        "openings": {
+            (i, j)
+            for i in (0, world["vlen"] - 1)
+            for j in range(1, world["hlen"] - 1)
+            if (i, j) not in world["wall"]
+        },
+    }
+    for blz in BLIZZARD:
+        rows = [0] * height
+        for pi, pj in world[blz]:
+            rows[pi - 1] |= 1 << (pj - 1)
+        valley[blz] = rows
+    return valley
+
+
+def search_frontier(player, goal, valley, cur_time, checkpoint=None, start=None):
+    """Breadth first search that keeps the set of cells reachable at every
+    minute instead of individual (time, position) states. A whole minute is
+    advanced with a few shifts and masks per row, so the memory is O(grid)
+    however long the search runs.
+
+    The frontier is saved to `checkpoint` every `checkpoint.every` minutes
+    and a saved `start` (time, frontier and cells at the openings) replaces
+    the player's position at `cur_time`.
+    """
+    if start is None:
+        frontier, at_open = [0] * valley["height"], set()
+        _add_to_frontier(pos=player, frontier=frontier, at_open=at_open)
+        ct = cur_time
+    else:
+        frontier, at_open, ct = start["frontier"], start["at_open"], start["time"]
+    while not _in_frontier(pos=goal, frontier=frontier, at_open=at_open):
+        ct += 1
+        frontier, at_open = _advance_frontier(
+            frontier=frontier,
+            at_open=at_open,
+            free=_free_rows(valley=valley, t=ct),
+            openings=valley["openings"],
+        )
+        if not at_open and not any(frontier):
+            raise ValueError(f"No path from {player} to {goal}")
+        if checkpoint is not None and ct % checkpoint.every == 0:
+            checkpoint.save(cur_time=ct, frontier=frontier, at_open=at_open)
+    return ct
+
+
+@dataclass
+class Checkpoint:
+    """Times of the finished trips and the frontier of the current one.
+
+    Saved as JSON as the row bitmasks can be wider than 64 bits, to a
+    temporary file that is renamed over the previous checkpoint.
+    """
+
+    path: str
+    every: int = CHECKPOINT_EVERY
+    trip_times: list = field(default_factory=list)
+
+    def save(self, cur_time, frontier=None, at_open=()):
+        state = {
+            "trip_times": self.trip_times,
+            "time": cur_time,
+            "frontier": frontier,
+            "at_open": sorted(at_open),
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
+
+    def load(self):
+        """Returns the finished trip times and the `start` of the current
+        trip for `search_frontier`, None if it has not started yet.
+        """
+        with open(self.path) as f:
+            state = json.load(f)
+        start = None
+        if state["frontier"] is not None:
+            start = {
+                "time": state["time"],
+                "frontier": state["frontier"],
+                "at_open": {tuple(pos) for pos in state["at_open"]},
+            }
+        return state["trip_times"], start
+
+
+def _add_to_frontier(pos, frontier, at_open):
+    pi, pj = pos
+    if pi == 0 or pi == len(frontier) + 1:
+        at_open.add(pos)
+    else:
+        frontier[pi - 1] |= 1 << (pj - 1)
+
+
+def _in_frontier(pos, frontier, at_open):
+    pi, pj = pos
+    if pi == 0 or pi == len(frontier) + 1:
+        return pos in at_open
+    return bool(frontier[pi - 1] >> (pj - 1) & 1)
+
+
+def _free_rows(valley, t):
+    """Row bitmasks of the inner cells without a blizzard at time t."""
+    width, height, full = valley["width"], valley["height"], valley["full"]
+    hshift, vshift = t % width, t % height
+    return [
+        full
+        & ~(
+            _rotr(valley["leftw"][r], hshift, width)
+            | _rotl(valley["rightw"][r], hshift, width)
+            | valley["upw"][(r + vshift) % height]
+            | valley["downw"][(r - vshift) % height]
+        )
+        for r in range(height)
+    ]
+
+
+def _rotl(row, shift, width):
+    return ((row << shift) | (row >> (width - shift))) & ((1 << width) - 1)
+
+
+def _rotr(row, shift, width):
+    return ((row >> shift) | (row << (width - shift))) & ((1 << width) - 1)
+
+
+def _advance_frontier(frontier, at_open, free, openings):
+    """Moves every reachable cell one minute ahead: wait, left, right, up or
+    down, then drops the cells a blizzard has moved into.
+    """
+    height = len(frontier)
+    new_frontier = []
+    for r, row in enumerate(frontier):
+        reach = row | (row << 1) | (row >> 1)
+        if r > 0:
+            reach |= frontier[r - 1]
+        if r < height - 1:
+            reach |= frontier[r + 1]
+        new_frontier.append(reach & free[r])
+    # The openings in the top and bottom walls are never hit by a blizzard
+    new_open = set(at_open)
+    for oi, oj in openings:
+        r, bit = (0 if oi == 0 else height - 1), 1 << (oj - 1)
+        if (oi, oj) in at_open:
+            new_frontier[r] |= bit & free[r]
+        if frontier[r] & bit:
+            new_open.add((oi, oj))
+    return new_frontier, new_open
+
+
 def _disp_progress(it, player, cur_time, worlder, qlen, disp_simple):
     if disp_simple:
         _simple_progress(cur_time=cur_time, qlen=qlen, it=it)
@@ -247,15 +385,62 @@ def _simple_progress(cur_time, qlen, it):
     return cur_time
 
 
+def _parse_args():
+    parser = argparse.ArgumentParser("Day 24")
+    parser.add_argument("--file", "-f", default="input.txt", help="Valley file.")
+    parser.add_argument(
+        "--engine", default="heapq", choices=["heapq", "frontier"], help="Search."
+    )
+    parser.add_argument(
+        "--cache",
+        default=False,
+        action="store_true",
+        help=(
+            "Memory-map the blizzard occupancy cached next to the input file, "
+            "heapq engine only."
+        ),
+    )
+    parser.add_argument(
+        "--checkpoint-every",
+        type=int,
+        help=(
+            "Save the frontier engine's search to <file>.checkpoint.json every "
+            f"these many minutes, {CHECKPOINT_EVERY} with --resume."
+        ),
+    )
+    parser.add_argument(
+        "--resume",
+        default=False,
+        action="store_true",
+        help="Resume the frontier engine from the checkpoint of an earlier run.",
+    )
+    opts = parser.parse_args()
+    if opts.cache and opts.engine != "heapq":
+        # the frontier engine builds its bitmasks from the valley, not a World
+        parser.error("--cache only applies to --engine heapq")
+    return opts
+
+
 if __name__ == "__main__":
-    orig_player, input_world = parse_fl("input.txt")
-    player, small_test_world = parse_fl("small_test.txt")
-    player, test_world = parse_fl("test.txt")
-    wld = test_world
+    opts = _parse_args()
+    orig_player, wld = parse_fl(opts.file)
+    every = opts.checkpoint_every or (CHECKPOINT_EVERY if opts.resume else None)
     rnd = search_wrapper(
         player=orig_player,
         goal=wld["goal"],
         st_world=wld,
         disp_simple=True,
         one_trip=False,
+        engine=opts.engine,
+        worlder=(
+            blizzard.load_world(fl=opts.file, world_at_t0=wld, cache=opts.cache)
+            if opts.engine == "heapq"
+            else None
+        ),
+        checkpoint=(
+            Checkpoint(path=f"{opts.file}.checkpoint.json", every=every)
+            if every
+            else None
+        ),
+        resume=opts.resume,
     )
@@ -5,6 +5,9 @@ import itertools as it
 import time
 import functools as ft
 import heapq
+import argparse
+
+import blizzard
 
 
 GRID_MP = {"#": "wall", ">": "rightw", "<": "leftw", "^": "upw", "v": "downw"}
@@ -13,25 +16,17 @@ BLIZZARD = {"rightw", "leftw", "upw", "downw"}
 
 
 def parse_fl(fl, grid_mp=GRID_MP):
-    lns = open(fl).read().splitlines()
-    hlen, vlen = len(lns[0]), len(lns)
+    grid = blizzard.load_grid(fl)
+    vlen, hlen = grid.shape
     state = {
         "time": 0,
         "player": (0, 1),
         "goal": (vlen - 1, hlen - 2),
-        "wall": set(),
-        "leftw": set(),
-        "rightw": set(),
-        "upw": set(),
-        "downw": set(),
         "hlen": hlen,
         "vlen": vlen,
     }
-    for i, ln in enumerate(lns):
-        for j, c in enumerate(ln):
-            if c not in grid_mp:
-                continue
-            state[grid_mp[c]].add((i, j))
+    for c, cell_type in grid_mp.items():
+        state[cell_type] = blizzard.grid_cells(grid=grid, char=c)
     return state
 
 
@@ -143,23 +138,32 @@ def timed_fn(f):
 
 
 @timed_fn
-def search_path(state, to_disp_state=False):
+def search_path(state, to_disp_state=False, worlder=None):
+    """If a `blizzard.World` is given as `worlder`, the blizzards are looked up
+    in its precomputed occupancy instead of being simulated minute by minute.
+    """
     cur_time, it, st_wc_time, seen = None, 0, time.time(), set()
     q = [ScoreState(hscore=0, state=state)]
     next_state_fn = NextState()
+    cache_fn = _cache_fn if worlder is None else ft.partial(_phase_key, worlder)
     while q:
         it += 1
         st = heapq.heappop(q).state
-        seen.add(_cache_fn(st))
+        seen.add(cache_fn(st))
         _disp_state(it, st, to_disp_state)
         cur_time = __update_progress(
             st_wc_time, cur_time=cur_time, state=st, qlen=len(q), it=it
         )
         if st["player"] == st["goal"]:
             return st["time"]
-        next_world_st = next_state_fn(state=st)
-        for ss in _next_valid_states(state=next_world_st):
-            if _cache_fn(ss.state) in seen:
+        if worlder is None:
+            next_world_st = next_state_fn(state=st)
+            is_free = ft.partial(_is_free, state=next_world_st)
+        else:
+            next_world_st = {**st, "time": st["time"] + 1}
+            is_free = ft.partial(worlder.is_free, next_world_st["time"])
+        for ss in _next_valid_states(state=next_world_st, is_free=is_free):
+            if cache_fn(ss.state) in seen:
                 # If i have come back to the same state as before after several
                 # steps, there is no point continuing the same options again
                 continue
@@ -170,6 +174,11 @@ def _cache_fn(s):
     return (s["player"], *(tuple(sorted(s[b])) for b in BLIZZARD))
 
 
+def _phase_key(worlder, s):
+    # Blizzards repeat every period, so the phase stands in for their positions
+    return (s["player"], s["time"] % worlder.period)
+
+
 def _disp_state(it, state, to_disp_state):
     if not to_disp_state:
         return
@@ -179,7 +188,7 @@ def _disp_state(it, state, to_disp_state):
     time.sleep(1.5)
 
 
-def _next_valid_states(state):
+def _next_valid_states(state, is_free):
     """Provides next states but uses A* to select which
     states are searched first.
     """
@@ -189,27 +198,28 @@ def _next_valid_states(state):
             continue
         pi, pj = state["player"]
         npi, npj = pi + adj_i, pj + adj_j
-        new_pos = (npi, npj)
-        if (
-            (npi < 0)
-            or (npj < 0)
-            or (npi >= state["vlen"])
-            or (npj > state["hlen"])
-            or any(
-                new_pos in state[obs]
-                for obs in ["wall", "leftw", "rightw", "upw", "downw"]
-            )
-        ):
+        if not is_free(npi, npj):
             continue
         # shallow copy as we are only changing player pos
         new_state = state.copy()
-        if npi < 0:
-            raise ValueError()
-        new_state["player"] = new_pos
+        new_state["player"] = (npi, npj)
         heuristic_score = _manhattan_dist(state=new_state) + new_state["time"]
         yield ScoreState(hscore=heuristic_score, state=new_state)
 
 
+def _is_free(npi, npj, state):
+    new_pos = (npi, npj)
+    return not (
+        (npi < 0)
+        or (npj < 0)
+        or (npi >= state["vlen"])
+        or (npj > state["hlen"])
+        or any(
+            new_pos in state[obs] for obs in ["wall", "leftw", "rightw", "upw", "downw"]
+        )
+    )
+
+
 def _manhattan_dist(state):
     (pi, pj), (gi, gj) = state["player"], state["goal"]
     return abs(pi - gi) + abs(pj - gj)
@@ -229,9 +239,25 @@ def __update_progress(st_wc_time, cur_time, state, qlen, it, to_print=True):
     return cur_time
 
 
+def _parse_args():
+    parser = argparse.ArgumentParser("Day 24")
+    parser.add_argument("--file", "-f", default="input.txt", help="Valley file.")
+    parser.add_argument(
+        "--cache",
+        default=False,
+        action="store_true",
+        help="Memory-map the blizzard occupancy cached next to the input file.",
+    )
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    input_state = parse_fl("input.txt")
-    small_test_state = parse_fl("small_test.txt")
-    test_state = parse_fl("test.txt")
-    rnd = search_path(input_state, to_disp_state=False)
+    opts = _parse_args()
+    input_state = parse_fl(opts.file)
+    worlder = (
+        blizzard.load_world(fl=opts.file, world_at_t0=input_state, cache=True)
+        if opts.cache
+        else None
+    )
+    rnd = search_path(input_state, to_disp_state=False, worlder=worlder)
     print(f"Number of rounds: {rnd}")
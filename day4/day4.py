@@ -2,6 +2,9 @@
 
 Usage::
     python -m day4.day4 --file day4/input.txt
+
+    # Map the shards of a large file over 8 processes
+    python -m day4.day4 --file day4/input.txt --workers 8
 """
 import dataclasses
 import util
@@ -22,9 +25,28 @@ class RangePair:
 
 
 def main() -> None:
+    opts = util.parse_args(
+        args={
+            "--workers": dict(
+                help="Processes to count the file shards in, all cores by default.",
+                type=int,
+            ),
+        }
+    )
+    subsets, overlaps = util.map_reduce_fl(
+        fl=opts.file,
+        map_fn=_count_shard,
+        reduce_fn=_add_counts,
+        workers=opts.workers,
+    )
+    print(f"Number of full subsets: {subsets}")
+    print(f"Number of overlaps: {overlaps}")
+
+
+def _count_shard(lns: list[str]) -> tuple[int, int]:
     subsets = 0
     overlaps = 0
-    for rp in util.iter_input_fl(parser=_parser):
+    for rp in map(_parser, lns):
         rp = cast(RangePair, rp)
         subsets += _is_subset_of(rp.first, rp.second) or _is_subset_of(
             rp.second, rp.first
@@ -32,8 +54,11 @@ def main() -> None:
         overlaps += _any_rt_overlap(rp.first, rp.second) or _any_rt_overlap(
             rp.second, rp.first
         )
-    print(f"Number of full subsets: {subsets}")
-    print(f"Number of overlaps: {overlaps}")
+    return subsets, overlaps
+
+
+def _add_counts(counts1: tuple[int, int], counts2: tuple[int, int]) -> tuple[int, int]:
+    return counts1[0] + counts2[0], counts1[1] + counts2[1]
 
 
 def _is_subset_of(small_rng: Range, big_rng: Range) -> bool:
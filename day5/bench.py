@@ -0,0 +1,90 @@
+"""Benchmark of the day5 crate movers on generated stacks and moves
+
+Compares `day5._move_stacks_inplace` with the mover it replaced, which
+copied the rest of the source stack on every move.
+
+Usage::
+
+    python -m day5.bench --crates 100000 --moves 100000
+
+    # CrateMover 9000
+    python -m day5.bench --crates 100000 --moves 100000 --reverse
+"""
+import random
+import string
+import time
+import util
+
+from day5 import day5
+from day5.day5 import Move
+from day5.day5 import Stacks
+
+
+def main():
+    opts = util.parse_args(
+        args={
+            "--stacks": dict(help="Number of stacks.", type=int, default=9),
+            "--crates": dict(help="Number of crates.", type=int, default=100_000),
+            "--moves": dict(help="Number of moves.", type=int, default=100_000),
+            "--max-num": dict(help="Most crates in a move.", type=int, default=50),
+            "--reverse": dict(
+                help="Should we reverse the crate while moving stacks",
+                default=False,
+                action="store_true",
+            ),
+            "--seed": dict(type=int, default=5),
+        }
+    )
+    stacks, moves = generate(
+        num_stacks=opts.stacks,
+        num_crates=opts.crates,
+        num_moves=opts.moves,
+        max_num=opts.max_num,
+        seed=opts.seed,
+    )
+    util.log.info(f"{opts.stacks} stacks, {opts.crates:,} crates, {opts.moves:,} moves")
+    tops = {}
+    for name, mover in [
+        ("copy", _move_stacks_copy),
+        ("inplace", day5._move_stacks_inplace),
+    ]:
+        stks = Stacks([stk[:] for stk in stacks])
+        st = time.time()
+        for move in moves:
+            mover(stacks=stks, move=move, to_reverse=opts.reverse)
+        elp = time.time() - st
+        tops[name] = day5._fetch_top_crates(stacks=stks)
+        util.log.info(f"{name:>8}: {elp:.3f}s {len(moves) / elp:,.0f} moves/s")
+    if len(set(tops.values())) != 1:
+        raise RuntimeError(f"The movers disagree on the top crates {tops}")
+
+
+def generate(
+    num_stacks: int, num_crates: int, num_moves: int, max_num: int, seed: int
+) -> tuple[Stacks, list[Move]]:
+    """Random stacks and moves that never take more crates than a stack has."""
+    rng = random.Random(seed)
+    stacks = Stacks([[] for _ in range(num_stacks)])
+    for _ in range(num_crates):
+        stacks[rng.randrange(num_stacks)].append(rng.choice(string.ascii_uppercase))
+    heights, moves = [len(stk) for stk in stacks], []
+    for _ in range(num_moves):
+        src = rng.choice([ix for ix, ht in enumerate(heights) if ht > 1])
+        tgt = rng.choice([ix for ix in range(num_stacks) if ix != src])
+        num = rng.randint(1, min(max_num, heights[src] - 1))
+        heights[src] -= num
+        heights[tgt] += num
+        moves.append(Move(src=src, tgt=tgt, num=num))
+    return stacks, moves
+
+
+def _move_stacks_copy(stacks: Stacks, move: Move, to_reverse: bool = True) -> None:
+    """The mover before it moved crates in place, kept as the baseline."""
+    src_stk, tgt_stk, num = stacks[move.src], stacks[move.tgt], move.num
+    moved_crates = reversed(src_stk[-num:]) if to_reverse else src_stk[-num:]
+    tgt_stk.extend(moved_crates)
+    stacks[move.src] = src_stk[:-num]
+
+
+if __name__ == "__main__":
+    main()
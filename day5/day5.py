@@ -9,17 +9,26 @@ Usage::
 
     # CrateMover 9000, does reverses stacks
     python -m day5.day5 --file day5/input.txt --reverse
+
+    # Parse the moves one line and one Move at a time
+    python -m day5.day5 --file day5/input.txt --parser line
 """
 import dataclasses
 import re
+import time
 import util
 
+from typing import BinaryIO
 from typing import cast
 from typing import NewType
 from typing import Generator
 
+import numpy as np
+
 
 Stacks = NewType("Stacks", list[list[str]])
+# Deleting these letters from "move 11 from 4 to 1" leaves " 11  4  1"
+MOVE_LETTERS = b"movefrt"
 
 
 @dataclasses.dataclass
@@ -37,14 +46,65 @@ def main():
                 default=False,
                 action="store_true",
             ),
+            "--parser": dict(
+                help="Parse the moves in blocks of bytes or line by line.",
+                choices=["block", "line"],
+                default="block",
+            ),
         }
     )
-    iter_fl = util.iter_fl(fl=opts.file)
+    if opts.parser == "block":
+        stacks, num_moves, parse_tm, apply_tm = _run_blocks(
+            fl=opts.file, to_reverse=opts.reverse
+        )
+    else:
+        stacks, num_moves, parse_tm, apply_tm = _run_lines(
+            fl=opts.file, to_reverse=opts.reverse
+        )
+    util.log.info(
+        f"Moves: {num_moves:,} | Parse: {parse_tm:.3f}s | Apply: {apply_tm:.3f}s"
+    )
+    util.log.info(f"Top of stacks {_fetch_top_crates(stacks=stacks)}")
+
+
+def _run_lines(fl: str, to_reverse: bool) -> tuple[Stacks, int, float, float]:
+    """Applies every move as soon as its line is parsed, like `_run_blocks`
+    one line at a time.
+    """
+    num_moves, parse_tm, apply_tm = 0, 0.0, 0.0
+    iter_fl = util.iter_fl(fl=fl)
     stacks = _parse_stacks(iter_fl)
     for ln in iter_fl:
+        st = time.perf_counter()
         move = _parse_move(ln)
-        _move_stacks_inplace(stacks=stacks, move=move, to_reverse=opts.reverse)
-    util.log.info(f"Top of stacks {_fetch_top_crates(stacks=stacks)}")
+        mid = time.perf_counter()
+        _move_stacks_inplace(stacks=stacks, move=move, to_reverse=to_reverse)
+        parse_tm, apply_tm = parse_tm + mid - st, apply_tm + time.perf_counter() - mid
+        num_moves += 1
+    return stacks, num_moves, parse_tm, apply_tm
+
+
+def _run_blocks(fl: str, to_reverse: bool) -> tuple[Stacks, int, float, float]:
+    """Applies every block of moves as soon as it is parsed and times the
+    parsing and the moving separately.
+    """
+    num_moves, parse_tm, apply_tm = 0, 0.0, 0.0
+    with open(fl, "rb") as infile:
+        stacks = _parse_stacks(
+            ln.decode().rstrip("\n") for ln in iter(infile.readline, b"")
+        )
+        blocks = iter_move_blocks(infile=infile)
+        while True:
+            st = time.time()
+            moves = next(blocks, None)
+            parse_tm += time.time() - st
+            if moves is None:
+                break
+            st = time.time()
+            apply_moves(stacks=stacks, moves=moves, to_reverse=to_reverse)
+            apply_tm += time.time() - st
+            num_moves += len(moves)
+    return stacks, num_moves, parse_tm, apply_tm
 
 
 def _parse_stacks(iter_fl: Generator[str, None, None]) -> Stacks:
@@ -76,7 +136,7 @@ def _parse_stacks(iter_fl: Generator[str, None, None]) -> Stacks:
         if ln[1] != "1":
             stk_lns.append(ln)
         else:
-            num_stks = int(ln[-2])
+            num_stks = int(ln.split()[-1])
             break
     # skip the blank line after stack identifier
     next(iter_fl)
@@ -105,16 +165,53 @@ def _parse_move(ln: str) -> Move:
     return Move(src=src - 1, tgt=tgt - 1, num=num)
 
 
+def iter_move_blocks(
+    infile: BinaryIO, block_size: int = util.BLOCK_SIZE
+) -> Generator[np.ndarray, None, None]:
+    """Reads the move lines in blocks of about `block_size` bytes and yields
+    each block as rows of (num, src, tgt) with 0-based stacks.
+
+    Sample input: b"move 1 from 2 to 1\nmove 3 from 1 to 3\n"
+    Sample output: np.array([[1, 1, 0], [3, 0, 2]])
+    """
+    for block in util.iter_fl_blocks(fl=infile, block_size=block_size):
+        yield _parse_move_block(block=block)
+
+
+def _parse_move_block(block: bytes) -> np.ndarray:
+    moves = np.fromstring(
+        block.translate(None, MOVE_LETTERS), dtype=np.int64, sep=" "
+    ).reshape(-1, 3)
+    moves[:, 1:] -= 1
+    return moves
+
+
+def apply_moves(stacks: Stacks, moves: np.ndarray, to_reverse: bool = True) -> None:
+    """`_move_stacks_inplace` for every (num, src, tgt) row of `moves`."""
+    # three flat lists are much cheaper to build than a list of rows
+    for num, src, tgt in zip(*(col.tolist() for col in moves.T)):
+        src_stk = stacks[src]
+        moved_crates = src_stk[-num:]
+        del src_stk[-num:]
+        if to_reverse:
+            moved_crates.reverse()
+        stacks[tgt].extend(moved_crates)
+
+
 def _move_stacks_inplace(stacks: Stacks, move: Move, to_reverse: bool = True) -> None:
     """CrateMover 9000 moves one crate at a time and CrateMover 9001 moves all
     crates at once. So for CrateMover 9000, the order is reversed in the target
     stack and not for CM 9001.
+
+    The crates are cut off the end of the source stack in place, so a move
+    costs O(num) however tall the stacks are.
     """
-    util.log.debug(stacks, move)
     src_stk, tgt_stk, num = stacks[move.src], stacks[move.tgt], move.num
-    moved_crates = reversed(src_stk[-num:]) if to_reverse else src_stk[-num:]
+    moved_crates = src_stk[-num:]
+    del src_stk[-num:]
+    if to_reverse:
+        moved_crates.reverse()
     tgt_stk.extend(moved_crates)
-    stacks[move.src] = src_stk[:-num]
 
 
 def _fetch_top_crates(stacks: Stacks) -> str:
@@ -1,15 +1,30 @@
+"""Helpers shared by the solutions
+
+Benchmark the file readers on an input::
+
+    python -m util --file day1/elf-calories.txt
+"""
 import argparse
+import functools
 import logging
+import os
+import time
 
+from concurrent.futures import ProcessPoolExecutor
 from typing import Any
+from typing import BinaryIO
 from typing import Callable
 from typing import Generator
 from typing import Optional
 from typing import Union
 
+import numpy as np
+
 
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger(__name__)
+BLOCK_SIZE = 1 << 20
+SHARD_SIZE = 64 << 20
 
 
 def parse_args(args: Optional[dict[str, dict[str, Any]]] = None) -> argparse.Namespace:
@@ -24,7 +39,7 @@ def parse_args(args: Optional[dict[str, dict[str, Any]]] = None) -> argparse.Nam
 def iter_input_fl(
     parser: Optional[Callable[[str], Any]] = None
 ) -> Generator[Union[Any, str], None, None]:
-    for ln in iter_fl(fl=parse_args().file):
+    for ln in iter_fl_lines(fl=parse_args().file):
         if parser:
             yield parser(ln)
         else:
@@ -36,3 +51,223 @@ def iter_fl(fl: str) -> Generator[str, None, None]:
         for ln in f:
             ln = ln.strip("\n")
             yield ln
+
+
+def iter_fl_lines(
+    fl: Union[str, BinaryIO], block_size: int = BLOCK_SIZE
+) -> Generator[str, None, None]:
+    """Same lines as `iter_fl`, read in blocks of bytes."""
+    for lns in iter_fl_batches(fl=fl, block_size=block_size):
+        yield from lns
+
+
+def iter_fl_batches(
+    fl: Union[str, BinaryIO], block_size: int = BLOCK_SIZE
+) -> Generator[list[str], None, None]:
+    """The lines of `iter_fl` in one list per block of `iter_fl_blocks`, so a
+    parser can work on a whole batch of lines at once. Like `iter_fl`, which
+    reads with universal newlines, "\r\n" and "\r" end a line too.
+    """
+    for block in iter_fl_blocks(fl=fl, block_size=block_size):
+        text = block.decode()
+        if "\r" in text:
+            # blocks end after a "\n", so they never cut a "\r\n"
+            text = text.replace("\r\n", "\n").replace("\r", "\n")
+        lns = text.split("\n")
+        if not lns[-1]:
+            # the newline that ends the block
+            lns.pop()
+        yield lns
+
+
+def iter_fl_blocks(
+    fl: Union[str, BinaryIO], block_size: int = BLOCK_SIZE
+) -> Generator[bytes, None, None]:
+    """Reads `fl`, a path or a file opened in binary mode, in blocks of about
+    `block_size` bytes. Every block holds whole lines, the start of a line
+    cut by a read is carried over to the next block.
+    """
+    if isinstance(fl, str):
+        with open(fl, "rb") as infile:
+            yield from iter_fl_blocks(fl=infile, block_size=block_size)
+        return
+    tail = b""
+    while block := fl.read(block_size):
+        block = tail + block
+        cut = block.rfind(b"\n") + 1
+        block, tail = block[:cut], block[cut:]
+        if block:
+            yield block
+    if tail:
+        yield tail
+
+
+def load_grid(fl: str) -> np.ndarray:
+    """Memory-maps a rectangular ASCII grid file as a read-only uint8 array of
+    shape (H, W). The array is a view of the (H, W+1) bytes of the file that
+    skips the newline column, or the (H, W+2) bytes and two columns of a
+    CRLF file, so nothing is copied or read up front.
+
+    Sample input: "#.#\n..#\n"
+    Sample output: np.array([[35, 46, 35], [46, 46, 35]], dtype=np.uint8)
+    """
+    flat = np.memmap(fl, dtype=np.uint8, mode="r")
+    newline = _first_newline(flat=flat)
+    # a "\r" before the newline is part of a CRLF line ending, not a cell
+    eol = 1 + int(0 < newline < len(flat) and flat[newline - 1] == ord("\r"))
+    width, stride = newline + 1 - eol, newline + 1
+    # the last line may or may not end with a line ending
+    height = (len(flat) + eol) // stride
+    is_rect = (
+        width > 0
+        and height * stride - len(flat) in (0, eol)
+        and (flat[newline::stride] == ord("\n")).all()
+        and ((flat[width::stride] == ord("\r")).all() or eol == 1)
+        and (height * stride == len(flat) or flat[-1] not in b"\r\n")
+    )
+    if not is_rect:
+        raise ValueError(f"{fl} is not a rectangular grid")
+    return np.lib.stride_tricks.as_strided(
+        flat, shape=(height, width), strides=(stride, 1), writeable=False
+    )
+
+
+def _first_newline(flat: np.ndarray, chunk_size: int = 1 << 16) -> int:
+    """Index of the first newline in `flat`, or its length if it has none,
+    scanned a chunk at a time so only the first line is read.
+    """
+    for start in range(0, len(flat), chunk_size):
+        newlines = np.flatnonzero(flat[start : start + chunk_size] == ord("\n"))
+        if len(newlines):
+            return start + int(newlines[0])
+    return len(flat)
+
+
+def grid_mask(grid: np.ndarray, chars: str) -> np.ndarray:
+    """Boolean mask of the cells of a `load_grid` grid holding any of `chars`."""
+    return np.isin(grid, np.frombuffer(chars.encode(), dtype=np.uint8))
+
+
+def map_reduce_fl(
+    fl: str,
+    map_fn: Callable[[list[str]], Any],
+    reduce_fn: Callable[[Any, Any], Any],
+    sep: bytes = b"\n",
+    lines_per_record: int = 1,
+    workers: Optional[int] = None,
+    shard_size: int = SHARD_SIZE,
+) -> Any:
+    """Splits `fl` into shards of about `shard_size` bytes that never cut a
+    record, maps `map_fn` over the records of every shard in a process pool
+    and folds the partial results, in file order, with `reduce_fn`.
+
+    A record is the text between two `sep`, e.g. sep=b"\n\n" for groups of
+    lines separated by a blank line, or `lines_per_record` lines joined with
+    a newline. `map_fn` and `reduce_fn` have to be picklable, module level
+    functions. With workers=1 the shards are mapped in this process. An
+    empty file is mapped as one shard without records.
+    """
+    bounds = _shard_bounds(
+        fl=fl, shard_size=shard_size, sep=sep, lines_per_record=lines_per_record
+    )
+    map_shard = functools.partial(
+        _map_shard,
+        fl=fl,
+        map_fn=map_fn,
+        sep=sep,
+        lines_per_record=lines_per_record,
+    )
+    # an empty file is one empty shard, so `map_fn([])` gives the result
+    shards = list(zip(bounds[:-1], bounds[1:])) or [(0, 0)]
+    if workers == 1 or len(shards) == 1:
+        partials = map(map_shard, shards)
+        return functools.reduce(reduce_fn, partials)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return functools.reduce(reduce_fn, pool.map(map_shard, shards))
+
+
+def _map_shard(
+    shard: tuple[int, int],
+    fl: str,
+    map_fn: Callable[[list[str]], Any],
+    sep: bytes,
+    lines_per_record: int,
+) -> Any:
+    start, stop = shard
+    with open(fl, "rb") as infile:
+        infile.seek(start)
+        text = infile.read(stop - start).decode()
+    records = text.split(sep.decode())
+    if lines_per_record > 1:
+        lns = records[:-1] if not records[-1] else records
+        records = [
+            sep.decode().join(lns[ix : ix + lines_per_record])
+            for ix in range(0, len(lns), lines_per_record)
+        ]
+    return map_fn([rec.strip("\n") for rec in records if rec.strip("\n")])
+
+
+def _shard_bounds(
+    fl: str, shard_size: int, sep: bytes, lines_per_record: int
+) -> list[int]:
+    """Byte offsets of the starts of the shards and the end of the file."""
+    size = os.path.getsize(fl)
+    if lines_per_record > 1:
+        return _line_group_bounds(
+            fl=fl, size=size, shard_size=shard_size, group=lines_per_record
+        )
+    bounds = [0]
+    with open(fl, "rb") as infile:
+        while bounds[-1] + shard_size < size:
+            # the next record starts after the first separator past the cut
+            infile.seek(bounds[-1] + shard_size - len(sep) + 1)
+            offset, window = infile.tell(), b""
+            while (found := window.find(sep)) < 0 and (block := infile.read(1 << 16)):
+                window += block
+            if found < 0:
+                break
+            bounds.append(offset + found + len(sep))
+    if bounds[-1] < size:
+        bounds.append(size)
+    return bounds
+
+
+def _line_group_bounds(fl: str, size: int, shard_size: int, group: int) -> list[int]:
+    """Shard bounds at every `group`-th line, so that the line groups never
+    straddle two shards. Needs one pass counting the newlines.
+    """
+    bounds, offset, num_lns = [0], 0, 0
+    for block in iter_fl_blocks(fl=fl):
+        if offset + len(block) - bounds[-1] >= shard_size:
+            # cut after the newline that completes the current line group
+            cut, lns_needed = 0, -num_lns % group
+            for _ in range(lns_needed):
+                cut = block.find(b"\n", cut) + 1
+                if not cut:
+                    break
+            if (cut or not lns_needed) and offset + cut > bounds[-1]:
+                bounds.append(offset + cut)
+        offset += len(block)
+        num_lns += block.count(b"\n")
+    if bounds[-1] < size:
+        bounds.append(size)
+    return bounds
+
+
+def _bench_readers(fl: str) -> None:
+    size_mb = os.path.getsize(fl) / 1e6
+    readers = {
+        "iter_fl": lambda: iter_fl(fl=fl),
+        "iter_fl_lines": lambda: iter_fl_lines(fl=fl),
+        "iter_fl_batches": lambda: iter_fl_batches(fl=fl),
+    }
+    for name, reader in readers.items():
+        st, num_lns = time.time(), 0
+        for item in reader():
+            num_lns += len(item) if isinstance(item, list) else 1
+        elp = time.time() - st
+        log.info(f"{name:>15}: {num_lns:,} lines {size_mb / elp:,.1f} MB/s")
+
+
+if __name__ == "__main__":
+    _bench_readers(fl=parse_args().file)